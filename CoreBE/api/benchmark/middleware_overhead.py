@@ -0,0 +1,131 @@
+"""
+Per-request middleware overhead on a trivial endpoint.
+
+Compares the app with no middleware, with the previous BaseHTTPMiddleware
+versions of the logging/rate-limit middlewares, and with the current pure
+ASGI ones. Requests are driven straight through the ASGI interface (no
+network, no server) so only application-side cost is measured. The rate
+limiter runs on its in-process fallback, Redis is not needed.
+
+Usage (from CoreBE/):
+    python -m api.benchmark.middleware_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from api.initialize.logging import RequestLoggingMiddleware
+from api.middleware.ratelimit.limiter import RateLimiter
+from api.middleware.ratelimit.middleware import RateLimitMiddleware, get_principal, rate_limit_headers
+from api.middleware.ratelimit.policies import RateLimitPolicy, match_policies
+
+POLICIES = [RateLimitPolicy("ip", calls=10**9, period=1)]
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    """BaseHTTPMiddleware version of RequestLoggingMiddleware, for comparison"""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        logger = logging.getLogger("api")
+        logger.info(f"Started {request.method} {request.url.path} from {request.client.host if request.client else 'unknown'}")
+        response = await call_next(request)
+        logger.info(f"Completed {response.status_code} in {time.time() - start_time:.3f}s - {request.method} {request.url.path}")
+        return response
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """BaseHTTPMiddleware version of RateLimitMiddleware, for comparison"""
+
+    def __init__(self, app, policies, limiter):
+        super().__init__(app)
+        self.policies = policies
+        self.limiter = limiter
+
+    async def dispatch(self, request: Request, call_next):
+        policies = match_policies(request.method, request.url.path, self.policies)
+        client_ip = request.client.host if request.client else "unknown"
+        principal = get_principal(request.headers) or f"ip:{client_ip}"
+        results = await self.limiter.hit_many([
+            (f"{policy.bucket}:{principal}", policy.calls, policy.period, policy.cost) for policy in policies
+        ])
+        response = await call_next(request)
+        response.headers.update(rate_limit_headers(policies[0], results[0]))
+        return response
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return PlainTextResponse("pong")
+
+    if variant == "base_http":
+        app.add_middleware(LegacyRateLimitMiddleware, policies=POLICIES, limiter=RateLimiter())
+        app.add_middleware(LegacyRequestLoggingMiddleware)
+    elif variant == "asgi":
+        app.add_middleware(RateLimitMiddleware, policies=POLICIES, limiter=RateLimiter())
+        app.add_middleware(RequestLoggingMiddleware)
+    return app
+
+async def call(app, scope):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(dict(scope), receive, send)
+
+async def measure(app, requests: int, rounds: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+        "app": app,
+    }
+    for _ in range(200):  # warm up
+        await call(app, scope)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(requests):
+            await call(app, scope)
+        timings.append((time.perf_counter() - started) / requests)
+    return statistics.median(timings)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # Measure middleware cost, not log output
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    for variant in ("none", "base_http", "asgi"):
+        app = build_app(variant)
+        async with app.router.lifespan_context(app):
+            results[variant] = await measure(app, args.requests, args.rounds)
+
+    baseline = results["none"]
+    print(f"{'variant':<12}{'us/request':>12}{'overhead us':>14}")
+    for variant, seconds in results.items():
+        print(f"{variant:<12}{seconds * 1e6:>12.1f}{(seconds - baseline) * 1e6:>14.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Login throughput per core: legacy SHA-256 vs the memory-hard hashers.
+
+For each algorithm, times one verify (the CPU cost of a login) and
+reports logins/s per core. Then runs `--concurrency` verifies at once
+through PasswordHashPool while a ticker measures the event loop lag,
+next to the same load hashed inline on the loop, which is what blocking
+the loop with a slow hash would look like.
+
+Usage (from CoreBE/):
+    python -m api.benchmark.password_hashing --runs 10 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from api.utils.crypto.crypto import legacy_digest
+from api.utils.crypto.hasher import PasswordHashPool, hash_password, verify_password, get_hasher
+
+PASSWORD = "thaco@1234"
+
+def _available_algorithms():
+    algorithms = ["sha256", "pbkdf2-sha256", "scrypt"]
+    try:
+        get_hasher("argon2id")
+        algorithms.append("argon2id")
+    except ImportError:
+        pass
+    return algorithms
+
+def _stored_hash(algorithm: str):
+    if algorithm == "sha256":
+        salt = os.urandom(16).hex()
+        return legacy_digest(PASSWORD, salt), salt
+    return hash_password(PASSWORD, algorithm), ""
+
+def verify_cost(algorithm: str, runs: int) -> float:
+    """Median seconds for one verify"""
+    encoded, salt = _stored_hash(algorithm)
+    # Legacy hashes take microseconds, so time them in batches
+    batch = 10000 if algorithm == "sha256" else 1
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        for _ in range(batch):
+            verify_password(encoded, PASSWORD, salt)
+        samples.append((time.perf_counter() - started) / batch)
+    return statistics.median(samples)
+
+async def _loop_lag(work) -> float:
+    """Worst event loop stall (ms) while `work` runs"""
+    worst = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst = max(worst, (time.perf_counter() - started - 0.001) * 1000)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    try:
+        await work()
+    finally:
+        done = True
+        await task
+    return worst
+
+async def concurrent_logins(algorithm: str, concurrency: int, workers: int):
+    encoded, salt = _stored_hash(algorithm)
+    pool = PasswordHashPool(workers=workers, max_queue=concurrency)
+
+    async def pooled():
+        await asyncio.gather(*(pool.verify(encoded, PASSWORD, salt) for _ in range(concurrency)))
+
+    async def inline():
+        for _ in range(concurrency):
+            verify_password(encoded, PASSWORD, salt)
+            await asyncio.sleep(0)
+
+    results = {}
+    for name, work in (("pool", pooled), ("inline", inline)):
+        started = time.perf_counter()
+        lag = await _loop_lag(work)
+        elapsed = time.perf_counter() - started
+        results[name] = (concurrency / elapsed, lag)
+    pool.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    algorithms = _available_algorithms()
+    print(f"{'algorithm':<16}{'verify ms':>12}{'logins/s/core':>16}")
+    for algorithm in algorithms:
+        cost = verify_cost(algorithm, args.runs)
+        print(f"{algorithm:<16}{cost * 1000:>12.3f}{1 / cost:>16.0f}")
+
+    print(f"\n{args.concurrency} concurrent logins, {args.workers} hashing workers")
+    print(f"{'algorithm':<16}{'mode':<8}{'logins/s':>12}{'max loop lag ms':>18}")
+    for algorithm in algorithms[1:]:
+        results = asyncio.run(concurrent_logins(algorithm, args.concurrency, args.workers))
+        for mode, (throughput, lag) in results.items():
+            print(f"{algorithm:<16}{mode:<8}{throughput:>12.1f}{lag:>18.1f}")
+
+if __name__ == "__main__":
+    main()
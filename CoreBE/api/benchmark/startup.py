@@ -0,0 +1,98 @@
+"""
+Cold-start time of one worker: importing api.main and building the app.
+
+Each run is a fresh interpreter, the way uvicorn spawns a worker. Reports
+the median import / create_app / first OpenAPI schema times, then a
+per-package breakdown of import self time (from `python -X importtime`),
+and fails when import + build goes over the budget or when a lazily
+loaded subsystem (MinIO, casbin, OpenSearch) got imported at startup.
+
+Usage (from CoreBE/):
+    python -m api.benchmark.startup --runs 5 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# Must not be imported until they are used
+LAZY_MODULES = ("minio", "casbin", "opensearchpy")
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import api.main as main
+t1 = time.perf_counter()
+app = main.create_app()
+t2 = time.perf_counter()
+app.openapi()
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "build_ms": (t2 - t1) * 1000,
+    "openapi_ms": (t3 - t2) * 1000,
+    "lazy_loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+def _run_probe(importtime: bool = False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", PROBE]
+    env = dict(os.environ, LOG_LEVEL="WARNING", PYTHONWARNINGS="ignore")
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+def _group(module: str) -> str:
+    # api.* is split per subpackage, everything else per top-level package
+    parts = module.split(".")
+    return ".".join(parts[:2]) if parts[0] == "api" else parts[0]
+
+def import_breakdown(stderr: str):
+    """Import self time (ms) per package from `-X importtime` output"""
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, module = line[len("import time:"):].split("|")
+        totals[_group(module.strip())] += int(self_us) / 1000
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", 1500)))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [_run_probe()[0] for _ in range(args.runs)]
+    timings = {key: statistics.median(run[key] for run in runs) for key in ("import_ms", "build_ms", "openapi_ms")}
+    total = timings["import_ms"] + timings["build_ms"]
+
+    print(f"{'phase':<22}{'median ms':>12}")
+    print(f"{'import api.main':<22}{timings['import_ms']:>12.1f}")
+    print(f"{'create_app()':<22}{timings['build_ms']:>12.1f}")
+    print(f"{'cold start total':<22}{total:>12.1f}   (budget {args.budget_ms:.0f})")
+    print(f"{'first openapi()':<22}{timings['openapi_ms']:>12.1f}   (on first /docs, not at startup)")
+
+    _, stderr = _run_probe(importtime=True)
+    print(f"\n{'package':<32}{'import self ms':>16}")
+    for package, ms in import_breakdown(stderr)[:args.top]:
+        print(f"{package:<32}{ms:>16.1f}")
+
+    failed = False
+    lazy_loaded = sorted({name for run in runs for name in run["lazy_loaded"]})
+    if lazy_loaded:
+        print(f"\nFAIL: imported at startup but should be lazy: {', '.join(lazy_loaded)}")
+        failed = True
+    if total > args.budget_ms:
+        print(f"\nFAIL: cold start {total:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
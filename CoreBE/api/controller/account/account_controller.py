@@ -1,8 +1,9 @@
 from fastapi import HTTPException, status, Body
 from typing import Optional, List, Dict, Any
 from api.service.account.account import AccountService
-from api.utils.response import create_response, create_paginated_response
+from api.utils.response import create_response, create_paginated_response, create_cursor_paginated_response
 from api.models.account_model import CreateAccount
+from api.response.errors import AppError
 
 class AccountController:
     def __init__(self, account_service: AccountService):
@@ -53,9 +54,105 @@ class AccountController:
             )
         except HTTPException:
             raise
+        except AppError as e:
+            # e.g. 503 when the password hashing queue is full
+            raise HTTPException(status_code=e.code, detail=e.message)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=str(e)
             )
 
+    async def import_accounts(
+        self,
+        body: bytes,
+        content_type: str,
+        created_by: str
+    ) -> Dict[str, Any]:
+        """Bulk import accounts"""
+        try:
+            result = await self.account_service.import_accounts(
+                body=body,
+                content_type=content_type,
+                created_by=created_by
+            )
+            return create_response(
+                status_code=status.HTTP_201_CREATED,
+                message=f"Imported {result['created']} of {result['total']} accounts",
+                data=result
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
+
+    async def list_accounts(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        include_total: bool = False
+    ) -> Dict[str, Any]:
+        """List accounts with cursor pagination"""
+        try:
+            items, next_cursor, total = await self.account_service.list_accounts(
+                limit=limit,
+                cursor=cursor,
+                include_total=include_total
+            )
+            return create_cursor_paginated_response(
+                items=items,
+                next_cursor=next_cursor,
+                limit=limit,
+                total=total
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
+
+    async def search_accounts(
+        self,
+        query: str,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Search accounts with cursor pagination"""
+        try:
+            result = await self.account_service.search_accounts(
+                query=query,
+                limit=limit,
+                cursor=cursor
+            )
+            return create_cursor_paginated_response(
+                items=result["items"],
+                next_cursor=result["next_cursor"],
+                limit=limit
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
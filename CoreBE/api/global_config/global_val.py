@@ -1,8 +1,11 @@
-from typing import Optional
-import redis
-import asyncpg
-from minio import Minio
-from casbin import Enforcer
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    # Annotations only: minio and casbin are imported where they are used
+    import asyncpg
+    import redis.asyncio as redis
+    from minio import Minio
+    from casbin import Enforcer
 
 class global_instance:
     _instance = None
@@ -16,10 +19,17 @@ class global_instance:
     def _initialize(self):
         self.config = None
         self.logger = None
-        self.pool: Optional[asyncpg.Pool] = None
-        self.redis_client: Optional[redis.Redis] = None
-        self.minio_client: Optional[Minio] = None
-        self.enforcer: Optional[Enforcer] = None
+        self.pool: "Optional[asyncpg.Pool]" = None
+        self.redis_client: "Optional[redis.Redis]" = None
+        self.minio_client: "Optional[Minio]" = None
+        self.enforcer: "Optional[Enforcer]" = None
+
+    def get_minio_client(self) -> "Minio":
+        """MinIO client, created (and the minio package imported) on first use"""
+        if self.minio_client is None:
+            from ..initialize.minio import MinIOInitializer
+            self.minio_client = MinIOInitializer().initialize()
+        return self.minio_client
 
 # Create a global instance
 global_instance = global_instance() 
\ No newline at end of file
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List
+
+from .postgres import get_pool
+from api.sql.keytoken import KeyTokenQuery
+
+logger = logging.getLogger(__name__)
+
+class CronJobInitializer:
+    def __init__(self):
+        self.jobs: Dict[str, tuple] = {}
+        self.tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, interval: float, func: Callable[[], Awaitable[None]]):
+        """Register a coroutine function to run every `interval` seconds"""
+        self.jobs[name] = (interval, func)
+
+    def initialize(self):
+        """Register default jobs and start them in the background"""
+        self.add_job(
+            "prune_used_refresh_tokens",
+            float(os.getenv('USED_TOKEN_PRUNE_INTERVAL', 600)),
+            prune_used_refresh_tokens
+        )
+        for name, (interval, func) in self.jobs.items():
+            self.tasks.append(asyncio.create_task(self._run(name, interval, func)))
+        logger.info(f"Cron jobs started: {', '.join(self.jobs)}")
+
+    async def _run(self, name: str, interval: float, func: Callable[[], Awaitable[None]]):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cron job {name} failed: {str(e)}")
+
+    async def close(self):
+        """Cancel all running jobs"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+        logger.info("Cron jobs stopped")
+
+async def prune_used_refresh_tokens():
+    """Remove expired used refresh tokens in small batches to keep locks short"""
+    batch_size = int(os.getenv('USED_TOKEN_PRUNE_BATCH', 1000))
+    pool = await get_pool()
+    total = 0
+    while True:
+        deleted = await KeyTokenQuery.prune_used_tokens(pool, batch_size)
+        total += deleted
+        if deleted < batch_size:
+            break
+        # Yield between batches so request handlers are not starved
+        await asyncio.sleep(0)
+    if total:
+        logger.info(f"Pruned {total} expired used refresh tokens")
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import time
+import urllib.request
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from api.global_config.global_val import global_instance
+from .postgres import get_pool, get_replica_router
+
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """Runs the deep dependency checks in the background and caches the results
+
+    Every `interval` seconds all checks run concurrently, each bounded by
+    `timeout`. Probes only read the cached report, so they cost nothing and
+    never add load to Postgres, Redis or the other backends. The service is
+    ready when every critical check passed in the last `stale_after` seconds.
+    """
+
+    def __init__(self, interval: float = 5.0, timeout: float = 2.0, stale_after: Optional[float] = None):
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after or (interval + timeout) * 3
+        self.started_at = time.time()
+        # name -> (check, critical)
+        self.checks: Dict[str, Tuple[Callable[[], Awaitable[Any]], bool]] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.last_run = 0.0  # monotonic time of the last completed round
+        self._task: Optional[asyncio.Task] = None
+
+    def add_check(self, name: str, check: Callable[[], Awaitable[Any]], critical: bool = True):
+        """Register a coroutine function that raises when the dependency is down"""
+        self.checks[name] = (check, critical)
+
+    def start(self):
+        self.started_at = time.time()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_checks()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Health checks failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def run_checks(self):
+        """Run every check once and replace the cached report"""
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._check(name) for name in names))
+        self.results = dict(zip(names, results))
+        self.last_run = time.monotonic()
+
+    async def _check(self, name: str) -> Dict[str, Any]:
+        check, critical = self.checks[name]
+        previous = self.results.get(name)
+        start = time.perf_counter()
+        try:
+            # A check may return another status, e.g. "unused"
+            status = await asyncio.wait_for(check(), self.timeout)
+            result = {"status": status if isinstance(status, str) else "up", "critical": critical}
+        except Exception as e:
+            error = "timeout" if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+            result = {"status": "down", "critical": critical, "error": error}
+            # Only log state changes, not every failed round
+            if previous is None or previous["status"] != "down":
+                logger.warning(f"Health check {name} failed: {error}")
+        else:
+            if previous is not None and previous["status"] == "down":
+                logger.info(f"Health check {name} recovered")
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        result["checked_at"] = time.time()
+        return result
+
+    def is_ready(self) -> bool:
+        if not self.last_run or time.monotonic() - self.last_run > self.stale_after:
+            return False
+        return not any(result["status"] == "down" for result in self.results.values() if result["critical"])
+
+    def liveness(self) -> Dict[str, Any]:
+        return {"status": "alive", "uptime": round(time.time() - self.started_at, 3)}
+
+    def readiness(self) -> Dict[str, Any]:
+        age = time.monotonic() - self.last_run if self.last_run else None
+        return {
+            "status": "ready" if self.is_ready() else "not_ready",
+            "checked_age": round(age, 3) if age is not None else None,
+            "services": self.results,
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+async def check_postgres():
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.fetchval("SELECT 1")
+
+async def check_replicas():
+    router = await get_replica_router()
+    failed = []
+    for index, pool in enumerate(router.pools):
+        try:
+            async with pool.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+            router.mark_healthy(pool)
+        except Exception:
+            router.mark_unhealthy(pool)
+            failed.append(f"replica-{index}")
+    if failed:
+        raise RuntimeError(f"unavailable: {', '.join(failed)}")
+
+async def check_redis():
+    await global_instance.redis_client.ping()
+
+async def check_minio():
+    # The client is created on first use; minio is a blocking client
+    if global_instance.minio_client is None:
+        return "unused"
+    await asyncio.to_thread(global_instance.minio_client.list_buckets)
+
+def _opensearch_check(url: str, timeout: float) -> Callable[[], Awaitable[None]]:
+    health_url = url.rstrip('/') + '/_cluster/health'
+
+    def probe():
+        with urllib.request.urlopen(health_url, timeout=timeout) as response:
+            if response.status >= 400:
+                raise RuntimeError(f"HTTP {response.status}")
+
+    async def check():
+        await asyncio.to_thread(probe)
+    return check
+
+async def register_health_checks(monitor: HealthMonitor):
+    """Checks for the services this worker is configured to use"""
+    monitor.add_check("postgres", check_postgres)
+    monitor.add_check("redis", check_redis)
+    if await get_replica_router() is not None:
+        # Reads fall back to the primary, so replicas do not gate readiness
+        monitor.add_check("postgres_replicas", check_replicas, critical=False)
+    if os.getenv('MINIO_ENDPOINT'):
+        monitor.add_check("minio", check_minio, critical=False)
+    opensearch_url = os.getenv('OPENSEARCH_URL')
+    if opensearch_url and os.getenv('HEALTH_CHECK_OPENSEARCH', 'false').lower() == 'true':
+        monitor.add_check("opensearch", _opensearch_check(opensearch_url, monitor.timeout), critical=False)
+
+# Global health monitor
+health_monitor = HealthMonitor(
+    interval=float(os.getenv('HEALTH_CHECK_INTERVAL', 5)),
+    timeout=float(os.getenv('HEALTH_CHECK_TIMEOUT', 2))
+)
@@ -1,76 +1,186 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
 import time
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-import json
-from datetime import datetime
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('app.log')
-    ]
-)
+from datetime import datetime, timezone
+from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger("api")
+access_logger = logging.getLogger("api.access")
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+class ColoredFormatter(logging.Formatter):
+    """Text formatter for local development, colors the whole line by level"""
+
+    COLORS = {
+        logging.INFO: "\033[32m",
+        logging.WARNING: "\033[33m",
+        logging.ERROR: "\033[31m",
+        logging.CRITICAL: "\033[31m",
+    }
+    RESET = "\033[0m"
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        color = self.COLORS.get(record.levelno)
+        return f"{color}{line}{self.RESET}" if color else line
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread; drops them if the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments here; formatting happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging():
+    """Configure the root logger once: queue -> background thread -> stdout (and file)
+
+    LOG_LEVEL, LOG_FORMAT (json|text), LOG_FILE (optional path) and
+    LOG_QUEUE_SIZE are read from the environment.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_format = os.getenv('LOG_FORMAT', 'json').lower()
+    if log_format == 'text':
+        formatter = ColoredFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    else:
+        formatter = JSONFormatter()
+
+    handlers = []
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
+
+    log_file = os.getenv('LOG_FILE')
+    if log_file:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(JSONFormatter() if log_format != 'text' else logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        handlers.append(file_handler)
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(NonBlockingQueueHandler(log_queue))
+    root.setLevel(getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO))
+
+    # Let uvicorn's loggers go through the same pipeline
+    for name in ('uvicorn', 'uvicorn.error', 'uvicorn.access'):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    # Requests are logged by RequestLoggingMiddleware
+    logging.getLogger('uvicorn.access').setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class RequestLoggingMiddleware:
+    """Pure ASGI access logger: one structured record per request
+
+    ACCESS_LOG_SAMPLE_RATE (0..1) keeps a fraction of successful requests;
+    server errors and requests slower than ACCESS_LOG_SLOW_MS are always kept.
+    Paths starting with an ACCESS_LOG_SKIP_PATHS prefix (default: the health
+    probes and the metrics scrape) are only logged when they fail.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: Optional[float] = None, slow_ms: Optional[float] = None):
+        self.app = app
+        self.skip_paths = tuple(p for p in os.getenv('ACCESS_LOG_SKIP_PATHS', '/health,/metrics').split(',') if p)
+        self.sample_rate = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', 1.0)) if sample_rate is None else sample_rate
+        self.slow_ms = float(os.getenv('ACCESS_LOG_SLOW_MS', 1000)) if slow_ms is None else slow_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
-        
-        # Get request details
-        method = request.method
-        path = request.url.path
-        client_host = request.client.host if request.client else "unknown"
-        
-        # Log request start
-        logger.info(f"Started {method} {path} from {client_host}")
-        
         try:
             # Process the request
-            response = await call_next(request)
-            
-            # Calculate processing time
-            process_time = time.time() - start_time
-            
-            # Log response details
-            logger.info(
-                f"Completed {response.status_code} in {process_time:.3f}s - {method} {path}"
-            )
-            
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            # Log any errors
-            process_time = time.time() - start_time
-            logger.error(
-                f"Error processing {method} {path} - {str(e)} - {process_time:.3f}s"
-            )
+            self._log(scope, 500, start_time, error=str(e))
             raise
+        self._log(scope, status_code, start_time)
 
-def setup_logging(app):
-    """Setup logging middleware for the application"""
-    app.add_middleware(RequestLoggingMiddleware)
-    logger.info("Logging middleware initialized")
-
-def log_request(request: Request, response: Response, process_time: float):
-    """Log detailed request information"""
-    log_data = {
-        "timestamp": datetime.now().isoformat(),
-        "method": request.method,
-        "path": request.url.path,
-        "status_code": response.status_code,
-        "process_time": f"{process_time:.3f}s",
-        "client_ip": request.client.host if request.client else "unknown",
-        "user_agent": request.headers.get("user-agent", "unknown")
-    }
-    
-    logger.info(json.dumps(log_data))
+    def _log(self, scope: Scope, status_code: int, start_time: float, error: Optional[str] = None):
+        # Duration covers the whole body, also for streamed responses
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        if status_code < 500 and duration_ms < self.slow_ms:
+            if self.skip_paths and scope["path"].startswith(self.skip_paths) and status_code < 400:
+                return
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return
+        client = scope.get("client")
+        extra = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(duration_ms, 3),
+            "client": client[0] if client else "unknown",
+        }
+        if error is not None:
+            extra["error"] = error
+            access_logger.error(f"Error processing {scope['method']} {scope['path']} - {error}", extra=extra)
+        else:
+            access_logger.info(f"{scope['method']} {scope['path']} {status_code}", extra=extra)
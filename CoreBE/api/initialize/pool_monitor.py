@@ -0,0 +1,256 @@
+import asyncio
+import bisect
+import logging
+import time
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+class LatencyHistogram:
+    """Cumulative fixed-bucket latency histogram (seconds)"""
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+    @classmethod
+    def quantile_of(cls, counts: List[int], q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile of `counts`"""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return cls.BUCKETS[index] if index < len(cls.BUCKETS) else float('inf')
+        return float('inf')
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(list(self.BUCKETS) + ['+Inf'], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile_of(self.counts, 0.5) * 1000,
+            "p95_ms": self.quantile_of(self.counts, 0.95) * 1000,
+            "p99_ms": self.quantile_of(self.counts, 0.99) * 1000,
+            "buckets": buckets,
+        }
+
+class AdjustableLimiter:
+    """Semaphore whose limit can be changed while in use"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Slot was handed over just as we got cancelled: pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    def set_limit(self, limit: int):
+        self.limit = limit
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_use < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_use += 1
+                future.set_result(None)
+
+class _AcquireContext:
+    """Awaitable / async context manager returned by MonitoredPool.acquire()"""
+
+    __slots__ = ('pool', 'timeout', 'conn')
+
+    def __init__(self, pool: "MonitoredPool", timeout: Optional[float]):
+        self.pool = pool
+        self.timeout = timeout
+        self.conn = None
+
+    def __await__(self):
+        return self.pool._acquire(self.timeout).__await__()
+
+    async def __aenter__(self):
+        self.conn = await self.pool._acquire(self.timeout)
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        conn, self.conn = self.conn, None
+        await self.pool.release(conn)
+
+class MonitoredPool:
+    """asyncpg pool wrapper recording acquire wait time and connection usage
+
+    Exposes the same acquire()/release()/close() interface as asyncpg.Pool
+    and forwards everything else to it. When `limit` is set, at most that
+    many connections are handed out at once (see PoolSizeController).
+    """
+
+    def __init__(self, pool: asyncpg.Pool, name: str, min_size: int, max_size: int,
+                 connections: "weakref.WeakSet", limit: Optional[int] = None):
+        self._pool = pool
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.connections = connections
+        self.limiter = AdjustableLimiter(limit) if limit is not None else None
+        self.acquire_latency = LatencyHistogram()
+        self.waiting = 0
+        self.in_use = 0
+        self.acquired_total = 0
+        self.acquire_errors = 0
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _AcquireContext:
+        return _AcquireContext(self, timeout)
+
+    async def _acquire(self, timeout: Optional[float]):
+        self.waiting += 1
+        started = time.perf_counter()
+        limited = False
+        try:
+            if self.limiter is not None:
+                await self.limiter.acquire()
+                limited = True
+            conn = await self._pool.acquire(timeout=timeout)
+        except BaseException:
+            self.acquire_errors += 1
+            if limited:
+                self.limiter.release()
+            raise
+        finally:
+            self.waiting -= 1
+        self.acquire_latency.observe(time.perf_counter() - started)
+        self.acquired_total += 1
+        self.in_use += 1
+        return conn
+
+    async def release(self, conn, *, timeout: Optional[float] = None):
+        try:
+            await self._pool.release(conn, timeout=timeout)
+        finally:
+            self.in_use -= 1
+            if self.limiter is not None:
+                self.limiter.release()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        connections = sorted(
+            (
+                {
+                    "pid": conn.get_server_pid(),
+                    "queries": conn.query_count,
+                    "age_s": round(time.monotonic() - conn.created_at, 1),
+                }
+                for conn in list(self.connections) if not conn.is_closed()
+            ),
+            key=lambda item: item["pid"]
+        )
+        return {
+            "name": self.name,
+            "size": self._pool.get_size(),
+            "idle": self._pool.get_idle_size(),
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "limit": self.limiter.limit if self.limiter is not None else self.max_size,
+            "acquired_total": self.acquired_total,
+            "acquire_errors": self.acquire_errors,
+            "acquire_latency": self.acquire_latency.to_dict(),
+            "connections": connections,
+        }
+
+class PoolSizeController:
+    """Grows or shrinks a MonitoredPool's connection limit within bounds
+
+    Every `interval` seconds it looks at the p95 acquire wait observed since
+    the previous tick: above `target_wait` it allows `step` more connections
+    (up to max_size), well below it and with spare connections it gives
+    `step` back (down to min_size). Connections above the limit go idle and
+    are closed by max_inactive_connection_lifetime.
+    """
+
+    def __init__(self, pool: MonitoredPool, interval: float = 5.0,
+                 target_wait: float = 0.01, step: int = 2):
+        self.pool = pool
+        self.interval = interval
+        self.target_wait = target_wait
+        self.step = step
+        self._previous = list(pool.acquire_latency.counts)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Adaptive sizing enabled for pool {self.pool.name}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Pool size controller failed: {str(e)}")
+
+    def tick(self):
+        limiter = self.pool.limiter
+        counts = list(self.pool.acquire_latency.counts)
+        window = [now - before for now, before in zip(counts, self._previous)]
+        self._previous = counts
+        if limiter is None or not sum(window):
+            return
+        p95 = LatencyHistogram.quantile_of(window, 0.95)
+        limit = limiter.limit
+        if p95 > self.target_wait and limit < self.pool.max_size:
+            limit = min(self.pool.max_size, limit + self.step)
+        elif p95 < self.target_wait / 4 and limiter.in_use < limit - self.step and limit > self.pool.min_size:
+            limit = max(self.pool.min_size, limit - self.step)
+        if limit != limiter.limit:
+            logger.info(f"Pool {self.pool.name}: limit {limiter.limit} -> {limit} (acquire p95 {p95 * 1000:.1f}ms)")
+            limiter.set_limit(limit)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
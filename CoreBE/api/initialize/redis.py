@@ -1,10 +1,43 @@
 import redis.asyncio as redis
 import logging
 import os
+import time
 from typing import Optional
+from api.utils.metrics.metrics import redis_command_duration, redis_command_errors
+from .tracing import KIND_CLIENT, span
 
 logger = logging.getLogger(__name__)
 
+class InstrumentedPipeline(redis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            with span("redis.PIPELINE", KIND_CLIENT):
+                return await super().execute(raise_on_error)
+        except Exception:
+            redis_command_errors.inc(("PIPELINE",))
+            raise
+        finally:
+            redis_command_duration.observe(time.perf_counter() - started, ("PIPELINE",))
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client recording per-command latency (scripts show up as EVALSHA)"""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        started = time.perf_counter()
+        try:
+            with span("redis." + command, KIND_CLIENT):
+                return await super().execute_command(*args, **options)
+        except Exception:
+            redis_command_errors.inc((command,))
+            raise
+        finally:
+            redis_command_duration.observe(time.perf_counter() - started, (command,))
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
 class RedisInitializer:
     def __init__(self):
         self.client: Optional[redis.Redis] = None
@@ -17,7 +50,7 @@ class RedisInitializer:
         """Initialize Redis connection"""
         try:
             # Create Redis client
-            self.client = redis.Redis(
+            self.client = InstrumentedRedis(
                 host=self.host,
                 port=self.port,
                 password=self.password,
@@ -2,6 +2,7 @@ from fastapi import APIRouter
 import logging
 from api.router.account.account_router import account_router
 from api.router.auth.auth_router import auth_router
+from api.router.internal.internal_router import internal_router
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,11 @@ class RouterInitializer:
                 prefix="/auth",
                 tags=["Authenticate"]
             )
+            self.main_router.include_router(
+                internal_router,
+                prefix="/internal",
+                tags=["Internal"]
+            )
             
             
             logger.info("All routers initialized successfully")
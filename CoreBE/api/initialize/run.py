@@ -1,4 +1,3 @@
-import uvicorn
 import logging
 import asyncio
 from contextlib import asynccontextmanager
@@ -6,42 +5,27 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
 import os
 from .logging import RequestLoggingMiddleware
-from colorama import Fore, Style, init
-from typing import Union
+from typing import Optional, Union
 from api.middleware.cors.cors import configure_cors
 from api.global_config.global_val import global_instance
 
-init(autoreset=True)
-
 from .redis import RedisInitializer
-from .postgres import PostgresInitializer
+from .postgres import get_pool, get_replica_router, close_pool, db_metrics
 from .router import RouterInitializer
+from .cronjob import CronJobInitializer
+from .server import ServerConfig, serve
+from .health import health_monitor, register_health_checks
+from api.router.health.health_router import health_router
+from api.router.metrics.metrics_router import metrics_router
+from api.middleware.metrics.middleware import MetricsMiddleware
+from api.middleware.tracing.middleware import TracingMiddleware
+from .tracing import span_exporter
+from api.utils.metrics.metrics import metrics
+from api.service.account.account_import import shutdown_import_executor
+from api.utils.crypto.hasher import password_hasher
+from api.utils.auth.session_cache import session_cache
 from api.middleware.ratelimit.middleware import RateLimitMiddleware
 
-class ColoredFormatter(logging.Formatter):
-    """Custom formatter with colors"""
-    
-    def format(self, record):
-        if record.levelno == logging.INFO:
-            record.msg = f"{Fore.GREEN}{record.msg}{Style.RESET_ALL}"
-        elif record.levelno == logging.WARNING:
-            record.msg = f"{Fore.YELLOW}{record.msg}{Style.RESET_ALL}"
-        elif record.levelno == logging.ERROR:
-            record.msg = f"{Fore.RED}{record.msg}{Style.RESET_ALL}"
-        return super().format(record)
-
-# Configure logging
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(ColoredFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-
-file_handler = logging.FileHandler('app.log')
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[console_handler, file_handler]
-)
-
 logger = logging.getLogger(__name__)
 
 class ApplicationRunner:
@@ -50,6 +34,7 @@ class ApplicationRunner:
         self.redis_client = None
         self.minio_client = None
         self.postgres_pool = None
+        self.cronjob = None
     @asynccontextmanager
     async def lifespan(self, app: FastAPI):
         """Application lifespan manager"""
@@ -75,18 +60,43 @@ class ApplicationRunner:
         redis_init = RedisInitializer()
         self.redis_client = await redis_init.initialize()
         global_instance.redis_client = self.redis_client # Assign to global instance
+        session_cache.start(self.redis_client)
+        # Publish this worker's metrics so /metrics on any worker sees all of them
+        metrics.start(self.redis_client, float(os.getenv('METRICS_FLUSH_INTERVAL', 5)))
         
-        # Initialize PostgreSQL
-        postgres_init = PostgresInitializer()
-        self.postgres_pool = await postgres_init.initialize()
+        # Initialize PostgreSQL (single pool shared by every request)
+        self.postgres_pool = await get_pool()
+        global_instance.pool = self.postgres_pool
+        replicas = await get_replica_router()
+        if replicas is not None:
+            # Read-your-writes markers are shared by every worker through Redis
+            replicas.redis_client = self.redis_client
+
+        # Start background maintenance jobs
+        self.cronjob = CronJobInitializer()
+        self.cronjob.initialize()
+
+        # Deep dependency checks run in the background; probes read the cache
+        await register_health_checks(health_monitor)
+        health_monitor.start()
     async def _cleanup_services(self):
         """Cleanup all services"""
         try:
+            await health_monitor.close()
+            if self.cronjob:
+                await self.cronjob.close()
+            await session_cache.close()
+            await metrics.close()
             if self.redis_client:
                 await self.redis_client.close()
             if self.postgres_pool:
-                await self.postgres_pool.close()
-                
+                await close_pool()
+                global_instance.pool = None
+                self.postgres_pool = None
+            shutdown_import_executor()
+            password_hasher.shutdown()
+            await asyncio.to_thread(span_exporter.shutdown)
+
         except Exception as e:
             logger.error(f"Error during cleanup: {str(e)}")
     
@@ -112,16 +122,18 @@ class ApplicationRunner:
         # Configure CORS
         configure_cors(self.app)
         
-        # Add rate limit middleware
-        self.app.add_middleware(
-            RateLimitMiddleware,
-            calls=1000,  # Số request tối đa trong một khoảng thời gian
-            period=1   # Khoảng thời gian tính bằng giây (60 giây = 1 phút)
-        )
+        # Add rate limit middleware (budgets per route/principal: middleware/ratelimit/policies.py)
+        self.app.add_middleware(RateLimitMiddleware)
         
         # Add request logging middleware
         self.app.add_middleware(RequestLoggingMiddleware)
         
+        # Add metrics middleware (rejected requests are counted too)
+        self.app.add_middleware(MetricsMiddleware)
+        
+        # Add tracing middleware (outermost: Server-Timing total covers the whole stack)
+        self.app.add_middleware(TracingMiddleware)
+        
         # Initialize routers
         router_init = RouterInitializer()
         main_router = router_init.initialize()
@@ -129,41 +141,15 @@ class ApplicationRunner:
         # Include main router without global authentication
         self.app.include_router(main_router, prefix="/api/v1")
         
-        # Add health check endpoint
-        @self.app.get("/health")
-        async def health_check():
-            logger.info("Health check endpoint called")
-            return {
-                "status": "healthy",
-                "version": "1.0.0",
-                "services": {
-                    "postgres": "connected" if self.postgres_pool else "disconnected",
-                    "redis": "connected" if self.redis_client else "disconnected",
-                    "opensearch": "connected" if self.opensearch_client else "disconnected",
-                    "minio": "connected" if self.minio_client else "disconnected"
-                }
-            }
+        # Liveness/readiness probes (results cached by the health monitor)
+        self.app.include_router(health_router)
+        
+        # Prometheus metrics
+        metrics.add_collector(db_metrics)
+        self.app.include_router(metrics_router)
         
         return self.app
     
-    def run(self, host="0.0.0.0", port=8000, reload=False):
-        """Run the application"""
-        if reload:
-            # When using reload, we need to use the module path
-            uvicorn.run(
-                "api.main:app",
-                host=host,
-                port=port,
-                reload=reload,
-                log_level="info"
-            )
-        else:
-            # When not using reload, we can use the app instance
-            app = self.create_app()
-            uvicorn.run(
-                app,
-                host=host,
-                port=port,
-                reload=reload,
-                log_level="info"
-            )
\ No newline at end of file
+    def run(self, config: Optional[ServerConfig] = None):
+        """Run the application (uvicorn builds it in each worker through `create_app`)"""
+        serve(config)
@@ -0,0 +1,119 @@
+import importlib.util
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# Import string uvicorn uses to build the app inside each worker process
+APP_FACTORY = "api.main:create_app"
+
+# Default worker cap: each worker opens its own Postgres pool, so more
+# workers only pay off once the database connection budget allows it
+DEFAULT_MAX_WORKERS = 4
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask, then cgroup CPU quota (containers)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            limit, period = f.read().split()
+            if limit != 'max':
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                limit = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+class ServerConfig:
+    """uvicorn settings read from the environment
+
+    ENVIRONMENT=dev runs one process with the reloader; anything else runs
+    SERVER_WORKERS processes that each build their own app, Redis client and
+    Postgres pool. The default is the usable CPUs (cgroup quota included),
+    capped at SERVER_MAX_WORKERS (4).
+    """
+
+    def __init__(self):
+        self.environment = os.getenv('ENVIRONMENT', 'production').lower()
+        self.host = os.getenv('HOST', '0.0.0.0')
+        self.port = int(os.getenv('PORT', 8000))
+        self.reload = self.environment == 'dev'
+        default_workers = min(available_cpus(), int(os.getenv('SERVER_MAX_WORKERS') or DEFAULT_MAX_WORKERS))
+        self.workers = 1 if self.reload else int(os.getenv('SERVER_WORKERS') or default_workers)
+        # uvloop / httptools are used when installed (uvicorn[standard])
+        self.loop = os.getenv('SERVER_LOOP') or ('uvloop' if _has_module('uvloop') else 'asyncio')
+        self.http = os.getenv('SERVER_HTTP') or ('httptools' if _has_module('httptools') else 'h11')
+        self.backlog = int(os.getenv('SERVER_BACKLOG', 2048))
+        # Keep idle connections a bit longer than the load balancer does
+        self.keep_alive = int(os.getenv('SERVER_KEEP_ALIVE', 75))
+        # SIGTERM: stop accepting, wait this long for in-flight requests, then run
+        # shutdown; keep it under the orchestrator's kill timeout
+        self.graceful_timeout = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 25))
+        limit_concurrency = os.getenv('SERVER_LIMIT_CONCURRENCY')
+        self.limit_concurrency = int(limit_concurrency) if limit_concurrency else None
+        max_requests = os.getenv('SERVER_MAX_REQUESTS')
+        self.max_requests = int(max_requests) if max_requests else None
+        self.proxy_headers = os.getenv('SERVER_PROXY_HEADERS', 'true').lower() == 'true'
+
+    def uvicorn_options(self) -> Dict[str, Any]:
+        """Keyword arguments for uvicorn.run"""
+        options = dict(
+            host=self.host,
+            port=self.port,
+            factory=True,
+            loop=self.loop,
+            http=self.http,
+            backlog=self.backlog,
+            timeout_keep_alive=self.keep_alive,
+            timeout_graceful_shutdown=self.graceful_timeout,
+            limit_concurrency=self.limit_concurrency,
+            limit_max_requests=self.max_requests,
+            proxy_headers=self.proxy_headers,
+            access_log=False,  # requests are logged by RequestLoggingMiddleware
+            log_level="info",
+            log_config=None  # keep the queue-based logging set up by setup_logging()
+        )
+        if self.reload:
+            options["reload"] = True
+        else:
+            options["workers"] = self.workers
+        return options
+
+    def describe(self) -> str:
+        if self.reload:
+            return f"dev (reload, 1 worker, loop={self.loop}, http={self.http})"
+        return (f"{self.environment} ({self.workers} workers, loop={self.loop}, http={self.http}, "
+                f"backlog={self.backlog}, keep-alive={self.keep_alive}s, graceful={self.graceful_timeout}s)")
+
+def serve(config: Optional[ServerConfig] = None):
+    """Start uvicorn with the `create_app` factory
+
+    The calling (master) process never builds the app or opens connections;
+    each worker does that in its own lifespan.
+    """
+    config = config or ServerConfig()
+    # Inherited by the worker processes, which split the DB connection budget
+    os.environ['SERVER_WORKER_COUNT'] = str(config.workers)
+    logger.info(f"Server mode: {config.describe()}")
+    uvicorn.run(APP_FACTORY, **config.uvicorn_options())
@@ -0,0 +1,147 @@
+import asyncpg
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from .pool_monitor import LatencyHistogram
+from .tracing import KIND_CLIENT, span
+
+logger = logging.getLogger(__name__)
+
+class PreparedConnection(asyncpg.Connection):
+    """Pool connection class that keeps the statements prepared on it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements: Dict[str, Any] = {}
+        self.query_count = 0
+        self.created_at = time.monotonic()
+
+    def count_query(self):
+        # Called through the pool proxy, which does not forward attribute writes
+        self.query_count += 1
+
+class StatementStats:
+    __slots__ = ('calls', 'prepared_hits', 'prepares', 'unprepared', 'errors', 'total_time', 'max_time', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.prepared_hits = 0  # ran on a statement already prepared on the connection
+        self.prepares = 0       # had to prepare on first use (not prepared in init hook)
+        self.unprepared = 0     # connection outside the registry pool (e.g. migrations)
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.latency = LatencyHistogram()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prepared_hits": self.prepared_hits,
+            "prepares": self.prepares,
+            "unprepared": self.unprepared,
+            "errors": self.errors,
+            "total_ms": round(self.total_time * 1000, 3),
+            "avg_ms": round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_time * 1000, 3),
+        }
+
+class Statement:
+    """A named SQL statement prepared once per pool connection"""
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.stats = StatementStats()
+        self.span_name = f"db.{name}"
+
+    async def fetch(self, conn, *args) -> List[asyncpg.Record]:
+        return await self._run(conn, 'fetch', args)
+
+    async def fetchrow(self, conn, *args) -> Optional[asyncpg.Record]:
+        return await self._run(conn, 'fetchrow', args)
+
+    async def fetchval(self, conn, *args) -> Any:
+        return await self._run(conn, 'fetchval', args)
+
+    async def execute(self, conn, *args) -> str:
+        """Run the statement and return its status string, like Connection.execute"""
+        return await self._run(conn, 'execute', args)
+
+    async def _run(self, conn, method: str, args: tuple) -> Any:
+        stats = self.stats
+        with span(self.span_name, KIND_CLIENT):
+            started = time.perf_counter()
+            try:
+                prepared = getattr(conn, 'prepared_statements', None)
+                if prepared is None:
+                    stats.unprepared += 1
+                    return await getattr(conn, method)(self.sql, *args)
+                conn.count_query()
+
+                stmt = prepared.get(self.name)
+                if stmt is None:
+                    stats.prepares += 1
+                    stmt = prepared[self.name] = await conn.prepare(self.sql)
+                else:
+                    stats.prepared_hits += 1
+
+                try:
+                    return await self._call(stmt, method, args)
+                except asyncpg.InvalidCachedStatementError:
+                    # Schema changed under the prepared plan: re-prepare once,
+                    # unless we are inside a transaction that is now aborted
+                    prepared.pop(self.name, None)
+                    if conn.is_in_transaction():
+                        raise
+                    stats.prepares += 1
+                    stmt = prepared[self.name] = await conn.prepare(self.sql)
+                    return await self._call(stmt, method, args)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.calls += 1
+                stats.total_time += elapsed
+                stats.latency.observe(elapsed)
+                if elapsed > stats.max_time:
+                    stats.max_time = elapsed
+
+    @staticmethod
+    async def _call(stmt, method: str, args: tuple) -> Any:
+        if method == 'execute':
+            # PreparedStatement has no execute(); fetch and report the status like Connection.execute
+            await stmt.fetch(*args)
+            return stmt.get_statusmsg()
+        return await getattr(stmt, method)(*args)
+
+class StatementRegistry:
+    def __init__(self):
+        self.statements: Dict[str, Statement] = {}
+
+    def register(self, name: str, sql: str) -> Statement:
+        """Register a statement so every new pool connection prepares it"""
+        if name in self.statements:
+            raise ValueError(f"Statement already registered: {name}")
+        statement = Statement(name, sql)
+        self.statements[name] = statement
+        return statement
+
+    async def prepare_all(self, conn):
+        """Prepare every registered statement on a new connection (pool init hook)"""
+        prepared = getattr(conn, 'prepared_statements', None)
+        if prepared is None:
+            return
+        for name, statement in self.statements.items():
+            try:
+                prepared[name] = await conn.prepare(statement.sql)
+            except Exception as e:
+                # e.g. table not created yet; the statement is prepared on first use instead
+                logger.warning(f"Could not prepare statement {name}: {str(e)}")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-statement execution counts and timings"""
+        return {name: statement.stats.to_dict() for name, statement in self.statements.items()}
+
+# Global statement registry
+statement_registry = StatementRegistry()
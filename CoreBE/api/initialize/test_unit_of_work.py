@@ -0,0 +1,57 @@
+import asyncio
+
+from api.initialize.postgres import UnitOfWork, release_connection
+
+class FakeTransaction:
+    def __init__(self, log):
+        self.log = log
+
+    async def start(self):
+        self.log.append("begin")
+
+    async def commit(self):
+        self.log.append("commit")
+
+    async def rollback(self):
+        self.log.append("rollback")
+
+class FakeConnection:
+    def __init__(self, log):
+        self.log = log
+
+    def transaction(self):
+        return FakeTransaction(self.log)
+
+class FakePool:
+    def __init__(self):
+        self.log = []
+
+    async def acquire(self):
+        self.log.append("acquire")
+        return FakeConnection(self.log)
+
+    async def release(self, conn):
+        self.log.append("release")
+
+def test_release_gives_back_a_plain_unit_connection():
+    async def scenario():
+        pool = FakePool()
+        uow = UnitOfWork(pool)
+        await uow.connection()
+        await release_connection(uow)
+        await uow.connection()
+        return pool.log
+
+    assert asyncio.run(scenario()) == ["acquire", "release", "acquire"]
+
+def test_release_keeps_a_transactional_unit_open():
+    async def scenario():
+        pool = FakePool()
+        uow = UnitOfWork(pool, transactional=True)
+        await uow.connection()
+        await release_connection(uow)
+        await uow.connection()
+        await uow.close(commit=True)
+        return pool.log
+
+    assert asyncio.run(scenario()) == ["acquire", "begin", "commit", "release"]
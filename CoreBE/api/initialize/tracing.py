@@ -0,0 +1,303 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Span kinds, as in OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+class Span:
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'kind', 'start_ns', 'end_ns', 'attributes', 'error', '_token')
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int, attributes: Optional[Dict[str, Any]]):
+        self.trace = trace
+        self.name = name
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        if self.attributes is None:
+            self.attributes = {}
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace.spans.append(self)
+        return False
+
+class _NoopSpan:
+    """Returned when the request is not traced: entering and leaving cost nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """Spans of one request
+
+    `export` is the sampling decision (send to the exporter), `server_timing`
+    whether the caller asked for a Server-Timing header.
+    """
+
+    __slots__ = ('trace_id', 'parent_id', 'export', 'server_timing', 'spans', 'root')
+
+    def __init__(self, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+                 export: bool = False, server_timing: bool = False):
+        self.trace_id = trace_id or "%032x" % random.getrandbits(128)
+        self.parent_id = parent_id
+        self.export = export
+        self.server_timing = server_timing
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+
+    def start_root(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Span:
+        self.root = Span(self, name, self.parent_id, KIND_SERVER, attributes)
+        return self.root
+
+    def server_timing_header(self) -> str:
+        """Server-Timing value: total duration per span name, in completion order"""
+        totals: Dict[str, List[float]] = {}
+        for span in self.spans:
+            if span is self.root:
+                continue
+            entry = totals.get(span.name)
+            if entry is None:
+                totals[span.name] = [span.duration_ms, 1]
+            else:
+                entry[0] += span.duration_ms
+                entry[1] += 1
+        parts = []
+        for name, (duration, count) in totals.items():
+            metric = _TOKEN_INVALID.sub("_", name)
+            desc = f"{name} x{count}" if count > 1 else name
+            parts.append(f'{metric};desc="{desc}";dur={duration:.3f}')
+        if self.root is not None:
+            parts.append(f"total;dur={self.root.duration_ms:.3f}")
+        return ", ".join(parts)
+
+# Server-Timing metric names are HTTP tokens
+_TOKEN_INVALID = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]")
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes: Any):
+    """Context manager timing a block as a child of the current span
+
+    Outside a traced request it returns a shared no-op object, so
+    instrumented code pays one ContextVar lookup.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    parent = _current_span.get()
+    return Span(trace, name, parent.span_id if parent is not None else trace.parent_id, kind, attributes or None)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def start_trace(trace: Trace):
+    """Make `trace` current for this task (and the tasks it creates); returns the reset token"""
+    return _current_trace.set(trace)
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+def parse_traceparent(value: str):
+    """W3C traceparent -> (trace_id, parent_span_id, sampled), or None if malformed"""
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+class Sampler:
+    """Head sampling: a fixed fraction of requests
+
+    With `respect_parent` the caller's traceparent sampled flag decides
+    instead; only turn it on when the flag comes from a trusted hop,
+    otherwise any client can force its requests to be exported.
+    """
+
+    def __init__(self, rate: float = 0.0, respect_parent: bool = False):
+        self.rate = max(0.0, min(1.0, rate))
+        self.respect_parent = respect_parent
+
+    def should_sample(self, parent_sampled: Optional[bool]) -> bool:
+        if parent_sampled is not None and self.respect_parent:
+            return parent_sampled
+        return self.rate > 0.0 and (self.rate >= 1.0 or random.random() < self.rate)
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+def _span_to_otlp(trace_id: str, span: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_attribute(key, value) for key, value in (span.attributes or {}).items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    return data
+
+def to_otlp(traces: List[Trace], service_name: str) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest body"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "api.initialize.tracing"},
+                "spans": [_span_to_otlp(trace.trace_id, span) for trace in traces for span in trace.spans],
+            }],
+        }]
+    }
+
+class SpanExporter:
+    """Ships finished traces off the event loop in OTLP/JSON
+
+    `submit` only puts the trace on a bounded queue (dropped when full); a
+    daemon thread batches them and appends one JSON line per batch to
+    `file_path` and/or POSTs them to an OTLP/HTTP collector at `endpoint`
+    (e.g. http://otel-collector:4318/v1/traces).
+    """
+
+    def __init__(self, file_path: Optional[str] = None, endpoint: Optional[str] = None,
+                 service_name: str = "chatbot-api", max_queue: int = 2048,
+                 batch_size: int = 256, flush_interval: float = 1.0, timeout: float = 5.0):
+        self.file_path = file_path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.endpoint)
+
+    def submit(self, trace: Trace):
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Trace] = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._export(batch)
+
+    def _export(self, batch: List[Trace]):
+        body = json.dumps(to_otlp(batch, self.service_name), separators=(",", ":"))
+        if self.file_path:
+            try:
+                with open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+            except OSError as e:
+                logger.warning(f"Could not write traces to {self.file_path}: {str(e)}")
+        if self.endpoint:
+            request = urllib.request.Request(
+                self.endpoint, data=body.encode("utf-8"),
+                headers={"Content-Type": "application/json"}, method="POST"
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+            except Exception as e:
+                logger.warning(f"Could not send traces to {self.endpoint}: {str(e)}")
+
+    def shutdown(self):
+        """Flush what is queued and stop the thread"""
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self.queue.put(None, timeout=self.timeout)
+            except queue.Full:
+                pass
+            self._thread.join(self.timeout)
+        self._thread = None
+
+# Global exporter (disabled unless TRACE_EXPORT_FILE or TRACE_EXPORT_URL is set)
+span_exporter = SpanExporter(
+    file_path=os.getenv('TRACE_EXPORT_FILE') or None,
+    endpoint=os.getenv('TRACE_EXPORT_URL') or None,
+    service_name=os.getenv('TRACE_SERVICE_NAME', 'chatbot-api')
+)
@@ -2,37 +2,12 @@ import os
 import sys
 import logging
 from pathlib import Path
-from api.initialize.run import ApplicationRunner
+from api.initialize.logging import setup_logging
+from api.initialize.server import ServerConfig, serve
 
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-def setup_logging():
-    """Configure logging for the application"""
-    log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
-    log_format = os.getenv('LOG_FORMAT', 
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    logging.basicConfig(
-        level=getattr(logging, log_level),
-        format=log_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
-    
-    # Add file handler if LOG_TO_FILE is enabled
-    if os.getenv('LOG_TO_FILE', 'false').lower() == 'true':
-        file_handler = logging.FileHandler('app.log')
-        file_handler.setFormatter(logging.Formatter(log_format))
-        logging.getLogger().addHandler(file_handler)
-    
-    # Set specific log levels for third-party libraries
-    logging.getLogger('uvicorn.access').setLevel(logging.WARNING)
-    logging.getLogger('fastapi').setLevel(logging.INFO)
-
-
 def load_environment():
     """Load environment variables from .env file if it exists"""
     env_file = project_root / '.env'
@@ -66,26 +41,24 @@ def validate_environment():
 
 def main():
     """Main entry point"""
+    load_environment()
     setup_logging()
     logger = logging.getLogger(__name__)
     
     try:
-        load_environment()
         validate_environment()
-        host = os.getenv('HOST', '0.0.0.0')
-        port = int(os.getenv('PORT', 8000))
-        reload = True  # Always enable reload mode to have SwaggerUI
+        config = ServerConfig()
         logger.info("=" * 60)
         logger.info("Starting ChatBot Local LLM API")
         logger.info("=" * 60)
-        logger.info(f"Host: {host}")
-        logger.info(f"Port: {port}")
-        logger.info(f"Environment: {os.getenv('ENVIRONMENT', 'production')}")
-        logger.info(f"Reload mode: {reload}")
-        logger.info(f"Docs URL: http://{host}:{port}/docs")
+        logger.info(f"Host: {config.host}")
+        logger.info(f"Port: {config.port}")
+        logger.info(f"Environment: {config.environment}")
+        logger.info(f"Reload mode: {config.reload}")
+        logger.info(f"Workers: {config.workers}")
+        logger.info(f"Docs URL: http://{config.host}:{config.port}/docs")
         logger.info("=" * 60)
-        runner = ApplicationRunner()
-        runner.run(host=host, port=port, reload=reload)
+        serve(config)
     except KeyboardInterrupt:
         logger.info("\nApplication stopped by user (Ctrl+C)")
     except ValueError as e:
@@ -98,14 +71,24 @@ def main():
 
 
 def create_app():
-    """Create FastAPI app instance for ASGI servers like gunicorn"""
-    setup_logging()
+    """Create FastAPI app instance (uvicorn factory, also for gunicorn)"""
     load_environment()
-    
+    setup_logging()
+    from api.initialize.run import ApplicationRunner
+
     runner = ApplicationRunner()
     return runner.create_app()
 
-app = create_app()
+_app = None
+
+def __getattr__(name):
+    # `api.main:app` still works, but the app is only built when asked for
+    if name == "app":
+        global _app
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,8 @@
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
 import logging
-import sys
-from api.utils.auth.jwt import verify_token_subject,check_blacklist,check_token_revoked
-
-# Configure logging with more detailed format
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+from api.utils.auth.jwt import verify_token_subject,check_token_state
+from api.initialize.tracing import span
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
@@ -25,7 +18,8 @@ class AuthMiddleware:
             # get token auth
             tokenauth = bearer_token.credentials
             # verify token
-            token_claims, error = await verify_token_subject(tokenauth)
+            with span("auth.verify_token"):
+                token_claims, error = await verify_token_subject(tokenauth)
             if error:
                 logger.error(f"Error verifying token: {error}")
                 raise HTTPException(
@@ -33,25 +27,24 @@ class AuthMiddleware:
                     detail="Invalid token",
                     headers={"WWW-Authenticate": "Bearer"}
                 )
-            # check blacklist
-            isblacklisted = await check_blacklist(token_claims.sub)
-            if isblacklisted:
-                logger.error("Token is blacklisted")
+            # check blacklist, session and revocation by change password (one Redis round trip)
+            with span("auth.token_state"):
+                token_state, error = await check_token_state(tokenauth, token_claims)
+            if error:
+                logger.error(f"Error checking token state: {error}")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token is blacklisted",
+                    detail="Invalid token",
                     headers={"WWW-Authenticate": "Bearer"}
                 )
-            # check token revoked by change password
-            isrevoked, error = await check_token_revoked(token_claims.sub, token_claims.iat)
-            if error:
-                logger.error(f"Error checking token revoked: {error}")
+            if token_state.blacklisted:
+                logger.error("Token is blacklisted")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token",
+                    detail="Token is blacklisted",
                     headers={"WWW-Authenticate": "Bearer"}
                 )
-            if isrevoked:
+            if token_state.revoked:
                 logger.error("Token is revoked")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,6 +54,8 @@ class AuthMiddleware:
             # Add subject UUID to request state
             logger.info(f"claims::: UUID:: {token_claims.sub}")
             request.state.subject_uuid = token_claims.sub
+            # Session already fetched (or cached) above; handlers reuse it instead of another GET
+            request.state.session = token_state.session
             return bearer_token
             
         logger.warning("No bearer token provided")
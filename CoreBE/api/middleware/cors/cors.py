@@ -11,4 +11,5 @@ def configure_cors(app: FastAPI):
         allow_credentials=True,
         allow_methods=["*"],  # Allows all methods
         allow_headers=["*"],  # Allows all headers
+        expose_headers=["Server-Timing"],  # timing breakdown for browser devtools
     )
@@ -0,0 +1,48 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from api.utils.metrics.metrics import http_request_duration, http_requests_in_progress
+
+def route_template(scope: Scope) -> str:
+    """Path template of the matched route, e.g. /api/v1/accounts/{account_id}
+
+    Keeps label cardinality bounded. Routers included by FastAPI keep the
+    route's own, unprefixed path on scope["route"]; the full template is on
+    the effective route context FastAPI stores next to it. Requests no route
+    matched share one label.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(context, "path_format", None) or getattr(route, "path_format", None) or route.path
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency per method, route template and status"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        http_requests_in_progress.inc((method,))
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress.dec((method,))
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                (method, route_template(scope), str(status_code))
+            )
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from api.middleware.metrics.middleware import MetricsMiddleware
+from api.utils.metrics.metrics import http_request_duration
+
+router = APIRouter()
+
+@router.get("/a/{x}/b/{y}")
+async def nested(x: str, y: str):
+    return {}
+
+@router.get("/{item}/{other}")
+async def pair(item: str, other: str):
+    return {}
+
+api = APIRouter()
+api.include_router(router, prefix="/things")
+app = FastAPI()
+app.include_router(api, prefix="/api/v1")
+app.add_middleware(MetricsMiddleware)
+client = TestClient(app)
+
+def routes_seen():
+    return {labels[1] for labels in http_request_duration.series}
+
+def test_route_label_is_the_route_template():
+    # Equal parameter values must not be mapped back onto the wrong segment
+    client.get("/api/v1/things/a/1/b/1")
+    client.get("/api/v1/things/items/items")
+    assert "/api/v1/things/a/{x}/b/{y}" in routes_seen()
+    assert "/api/v1/things/{item}/{other}" in routes_seen()
+
+def test_unmatched_requests_share_one_label():
+    client.get("/nowhere/at/all/really")
+    assert "unmatched" in routes_seen()
@@ -1,3 +1,5 @@
 from .middleware import RateLimitMiddleware
+from .limiter import RateLimiter, rate_limiter
+from .policies import RateLimitPolicy, RATE_LIMIT_POLICIES
 
-__all__ = ['RateLimitMiddleware'] 
\ No newline at end of file
+__all__ = ['RateLimitMiddleware', 'RateLimiter', 'rate_limiter', 'RateLimitPolicy', 'RATE_LIMIT_POLICIES']
\ No newline at end of file
@@ -0,0 +1,226 @@
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from api.global_config.global_val import global_instance
+
+logger = logging.getLogger(__name__)
+
+# GCRA (generic cell rate algorithm): one "theoretical arrival time" per key,
+# so memory is O(1) per client and the key expires by itself once idle.
+# Several budgets are checked in one call and charged all-or-nothing.
+# ARGV holds 4 values per key: emission interval (ms per unit), tolerance
+# (ms, = period), cost of this request, units wanted (>= cost, extra units
+# are leased to the worker).
+# Returns 4 values per key: {granted, remaining, retry_after_ms, reset_after_ms}.
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tats = {}
+local allowed = true
+for i = 1, #KEYS do
+    local base = (i - 1) * 4
+    local emission = tonumber(ARGV[base + 1])
+    local tolerance = tonumber(ARGV[base + 2])
+    local cost = tonumber(ARGV[base + 3])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then
+        tat = now
+    end
+    tats[i] = tat
+    if math.floor((now + tolerance - tat) / emission) < cost then
+        allowed = false
+    end
+end
+local result = {}
+for i = 1, #KEYS do
+    local base = (i - 1) * 4
+    local emission = tonumber(ARGV[base + 1])
+    local tolerance = tonumber(ARGV[base + 2])
+    local cost = tonumber(ARGV[base + 3])
+    local wanted = tonumber(ARGV[base + 4])
+    local tat = tats[i]
+    local available = math.floor((now + tolerance - tat) / emission)
+    if not allowed then
+        local retry = 0
+        if available < cost then
+            retry = math.ceil(tat + emission * cost - tolerance - now)
+        end
+        table.insert(result, 0)
+        table.insert(result, math.max(available, 0))
+        table.insert(result, retry)
+        table.insert(result, math.ceil(tat - now))
+    else
+        local granted = math.min(wanted, available)
+        local new_tat = tat + emission * granted
+        redis.call('SET', KEYS[i], tostring(new_tat), 'PX', math.max(1, math.ceil(new_tat - now)))
+        table.insert(result, granted)
+        table.insert(result, available - granted)
+        table.insert(result, 0)
+        table.insert(result, math.ceil(new_tat - now))
+    end
+end
+return result
+"""
+
+# (key, calls, period seconds, cost)
+RateLimitHit = Tuple[str, int, float, int]
+
+class RateLimitResult:
+    __slots__ = ('allowed', 'limit', 'period', 'remaining', 'retry_after', 'reset_after')
+
+    def __init__(self, allowed: bool, limit: int, period: float, remaining: int, retry_after: float, reset_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.period = period
+        self.remaining = remaining
+        self.retry_after = retry_after  # seconds until the request would be allowed
+        self.reset_after = reset_after  # seconds until the full budget is back
+
+class _LocalEntry:
+    __slots__ = ('tokens', 'lease_expires', 'blocked_until', 'remaining', 'reset_at', 'tat')
+
+    def __init__(self):
+        self.tokens = 0
+        self.lease_expires = 0.0
+        self.blocked_until = 0.0
+        self.remaining = 0
+        self.reset_at = 0.0
+        self.tat = 0.0  # only used by the in-process fallback
+
+class RateLimiter:
+    """Distributed GCRA limiter with a local fast path
+
+    Every allowed call to Redis may lease up to `lease` units per key; the
+    worker then spends them locally until they run out or the lease expires.
+    Clients that Redis rejected are rejected locally until their retry time.
+    Local state is an LRU bounded to `max_local_keys`. Without Redis the same
+    algorithm runs per worker.
+    """
+
+    def __init__(self, prefix: str = "RL:", lease: int = 1, lease_ttl: float = 1.0, max_local_keys: int = 10000):
+        self.prefix = prefix
+        self.lease = max(1, lease)
+        self.lease_ttl = lease_ttl
+        self.max_local_keys = max_local_keys
+        self._local: "OrderedDict[str, _LocalEntry]" = OrderedDict()
+        self._script = None
+
+    def _entry(self, key: str) -> _LocalEntry:
+        entry = self._local.get(key)
+        if entry is None:
+            entry = self._local[key] = _LocalEntry()
+            while len(self._local) > self.max_local_keys:
+                self._local.popitem(last=False)
+        else:
+            self._local.move_to_end(key)
+        return entry
+
+    def _get_script(self, client):
+        if self._script is None or self._script.registered_client is not client:
+            self._script = client.register_script(GCRA_SCRIPT)
+        return self._script
+
+    async def hit(self, key: str, calls: int, period: float, cost: int = 1) -> RateLimitResult:
+        """Charge `cost` units against a budget of `calls` per `period` seconds"""
+        return (await self.hit_many([(key, calls, period, cost)]))[0]
+
+    async def hit_many(self, hits: Sequence[RateLimitHit]) -> List[RateLimitResult]:
+        """Charge several budgets at once; either all are charged or none"""
+        now = time.monotonic()
+        entries = [self._entry(key) for key, _, _, _ in hits]
+
+        # Already blocked: reject without touching Redis
+        if any(entry.blocked_until > now for entry in entries):
+            return [self._peek(entry, calls, period, now) for entry, (_, calls, period, _) in zip(entries, hits)]
+
+        leased = []
+        pending = []
+        for index, (entry, (_, _, _, cost)) in enumerate(zip(entries, hits)):
+            if entry.tokens >= cost and entry.lease_expires > now:
+                entry.tokens -= cost
+                leased.append(index)
+            else:
+                pending.append(index)
+
+        results: List[Optional[RateLimitResult]] = [None] * len(hits)
+        for index in leased:
+            entry, (_, calls, period, _) = entries[index], hits[index]
+            results[index] = RateLimitResult(True, calls, period, entry.remaining + entry.tokens, 0.0, max(0.0, entry.reset_at - now))
+        if not pending:
+            return results
+
+        replies = await self._charge([hits[index] for index in pending], [entries[index] for index in pending], now)
+        allowed = all(granted for granted, _, _, _ in replies)
+        for index, (granted, remaining, retry_after, reset_after) in zip(pending, replies):
+            results[index] = self._apply(entries[index], hits[index], allowed, granted, remaining, retry_after, reset_after, now)
+        if not allowed:
+            # Nothing is charged when one budget refuses: give leased units back
+            for index in leased:
+                entries[index].tokens += hits[index][3]
+                results[index].allowed = False
+        return results
+
+    async def _charge(self, hits: Sequence[RateLimitHit], entries: Sequence[_LocalEntry], now: float) -> List[Tuple[int, int, float, float]]:
+        client = global_instance.redis_client
+        if client is not None:
+            try:
+                script = self._get_script(client)
+                args = []
+                for _, calls, period, cost in hits:
+                    args.extend([period * 1000 / calls, period * 1000, cost, max(cost, self.lease)])
+                reply = await script(keys=[self.prefix + key for key, _, _, _ in hits], args=args)
+                return [
+                    (int(reply[i]), int(reply[i + 1]), reply[i + 2] / 1000, reply[i + 3] / 1000)
+                    for i in range(0, len(reply), 4)
+                ]
+            except Exception as e:
+                logger.warning(f"Rate limiter falling back to local state: {str(e)}")
+        return self._charge_local(hits, entries, now)
+
+    @staticmethod
+    def _charge_local(hits: Sequence[RateLimitHit], entries: Sequence[_LocalEntry], now: float) -> List[Tuple[int, int, float, float]]:
+        states = []
+        for (_, calls, period, cost), entry in zip(hits, entries):
+            emission = period / calls
+            tat = max(entry.tat, now)
+            states.append((emission, period, cost, tat, math.floor((now + period - tat) / emission)))
+        allowed = all(available >= cost for _, _, cost, _, available in states)
+        replies = []
+        for entry, (emission, period, cost, tat, available) in zip(entries, states):
+            if not allowed:
+                retry_after = tat + emission * cost - period - now if available < cost else 0.0
+                replies.append((0, max(available, 0), retry_after, tat - now))
+            else:
+                entry.tat = tat + emission * cost
+                replies.append((cost, available - cost, 0.0, entry.tat - now))
+        return replies
+
+    def _apply(self, entry: _LocalEntry, hit: RateLimitHit, allowed: bool, granted: int, remaining: int,
+               retry_after: float, reset_after: float, now: float) -> RateLimitResult:
+        _, calls, period, cost = hit
+        entry.reset_at = now + reset_after
+        if not allowed:
+            if retry_after > 0:
+                entry.tokens = 0
+                entry.blocked_until = now + retry_after
+            return RateLimitResult(False, calls, period, remaining, retry_after, reset_after)
+        entry.tokens = granted - cost
+        entry.remaining = remaining
+        entry.lease_expires = now + self.lease_ttl
+        return RateLimitResult(True, calls, period, remaining + entry.tokens, 0.0, reset_after)
+
+    @staticmethod
+    def _peek(entry: _LocalEntry, calls: int, period: float, now: float) -> RateLimitResult:
+        retry_after = max(0.0, entry.blocked_until - now)
+        return RateLimitResult(False, calls, period, 0 if retry_after else entry.remaining, retry_after, max(0.0, entry.reset_at - now))
+
+# Global rate limiter
+rate_limiter = RateLimiter(
+    lease=int(os.getenv('RATE_LIMIT_LEASE', 1)),
+    lease_ttl=float(os.getenv('RATE_LIMIT_LEASE_TTL', 1)),
+    max_local_keys=int(os.getenv('RATE_LIMIT_LOCAL_KEYS', 10000))
+)
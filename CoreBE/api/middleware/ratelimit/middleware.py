@@ -1,40 +1,142 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-import time
-from collections import defaultdict, deque
+import hashlib
+import json
+import jwt
+import math
 import logging
+import os
+from typing import List, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .limiter import RateLimiter, RateLimitResult, rate_limiter
+from .policies import RateLimitPolicy, RATE_LIMIT_POLICIES, match_policies
 
 logger = logging.getLogger(__name__)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, calls: int = 100, period: int = 60):
-        super().__init__(app)
-        self.calls = calls
-        self.period = period
-        self.clients = defaultdict(deque)
-
-    async def dispatch(self, request: Request, call_next):
-        # Get client IP
-        client_ip = request.client.host
-        
-        # Current time
-        now = time.time()
-        
-        # Clean old requests
-        while (self.clients[client_ip] and 
-               now - self.clients[client_ip][0] > self.period):
-            self.clients[client_ip].popleft()
-        
-        # Check rate limit
-        if len(self.clients[client_ip]) >= self.calls:
-            logger.warning(f"Rate limit exceeded for IP: {client_ip}")
-            return JSONResponse(
+# Larger login bodies are not parsed for the username (the IP alone is used)
+MAX_LOGIN_BODY = 4096
+
+def get_principal(headers: Headers) -> Optional[str]:
+    """Bucket identity of the caller: verified token subject, else None (use the IP)
+
+    Runs before the auth dependency, so the signature and expiry are checked
+    here; otherwise every forged `sub` would get a fresh bucket. API keys
+    are not validated anywhere yet, so they do not define a principal either.
+    """
+    authorization = headers.get("authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        try:
+            claims = jwt.decode(authorization[7:], os.getenv("SECRET_KEY", "Thaco@1234"), algorithms=["HS256"])
+            subject = claims.get("sub")
+            if subject:
+                return f"sub:{subject}"
+        except jwt.InvalidTokenError:
+            pass
+    return None
+
+async def read_body(receive: Receive, limit: int) -> Tuple[bytes, Receive]:
+    """Read the request body (up to about `limit` bytes) and a receive that replays it"""
+    messages: List[Message] = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        size += len(message.get("body", b""))
+        if not message.get("more_body", False) or size > limit:
+            break
+    body = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.request")
+
+    async def replay() -> Message:
+        if messages:
+            return messages.pop(0)
+        return await receive()
+    return body, replay
+
+def login_username(body: bytes) -> Optional[str]:
+    """Username of a JSON login body, normalized and hashed for the key name"""
+    try:
+        username = json.loads(body).get("username")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(username, str) or not username.strip():
+        return None
+    return hashlib.sha256(username.strip().lower().encode("utf-8")).hexdigest()[:32]
+
+def rate_limit_headers(policy: RateLimitPolicy, result: RateLimitResult) -> dict:
+    return {
+        "RateLimit-Limit": str(result.limit),
+        "RateLimit-Remaining": str(max(0, result.remaining)),
+        "RateLimit-Reset": str(math.ceil(result.reset_after)),
+        "RateLimit-Policy": f"{result.limit};w={int(result.period)};name=\"{policy.bucket}\"",
+    }
+
+class RateLimitMiddleware:
+    """Pure ASGI rate limiter; allowed responses (including streams) pass through unbuffered"""
+
+    def __init__(self, app: ASGIApp, policies: Optional[List[RateLimitPolicy]] = None, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.policies = policies if policies is not None else RATE_LIMIT_POLICIES
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policies = match_policies(scope["method"], scope["path"], self.policies)
+        if not policies:
+            await self.app(scope, receive, send)
+            return
+
+        # Get client IP and principal
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        principal = None
+        if any(policy.scope == "principal" for policy in policies):
+            principal = get_principal(Headers(scope=scope)) or f"ip:{client_ip}"
+        ip_username = None
+        if any(policy.scope == "ip_username" for policy in policies):
+            body, receive = await read_body(receive, MAX_LOGIN_BODY)
+            username = login_username(body) if len(body) <= MAX_LOGIN_BODY else None
+            ip_username = f"ip:{client_ip}:user:{username}" if username else f"ip:{client_ip}"
+
+        hits = []
+        for policy in policies:
+            if policy.scope == "global":
+                identity = "all"
+            elif policy.scope == "principal":
+                identity = principal
+            elif policy.scope == "ip_username":
+                identity = ip_username
+            else:
+                identity = f"ip:{client_ip}"
+            hits.append((f"{policy.bucket}:{identity}", policy.calls, policy.period, policy.cost))
+
+        # Check every budget in one round trip (shared by every worker through Redis)
+        results = await self.limiter.hit_many(hits)
+        denied = [(policy, result) for policy, result in zip(policies, results) if not result.allowed]
+        if denied:
+            policy, result = max(denied, key=lambda item: item[1].retry_after)
+            logger.warning(f"Rate limit {policy.name} exceeded for {principal or client_ip}")
+            headers = rate_limit_headers(policy, result)
+            headers["Retry-After"] = str(max(1, math.ceil(result.retry_after)))
+            response = JSONResponse(
                 status_code=429,
-                content={"message": "Rate limit exceeded. Too many requests."}
+                content={"message": "Rate limit exceeded. Too many requests."},
+                headers=headers
             )
-        
-        # Add current request
-        self.clients[client_ip].append(now)
-        
-        return await call_next(request) 
\ No newline at end of file
+            await response(scope, receive, send)
+            return
+
+        # Report the budget closest to running out
+        policy, result = min(zip(policies, results), key=lambda item: item[1].remaining / item[1].limit)
+        extra_headers = rate_limit_headers(policy, result)
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(extra_headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
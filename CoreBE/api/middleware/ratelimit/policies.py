@@ -0,0 +1,83 @@
+import os
+from typing import FrozenSet, Iterable, List, Optional
+
+API_PREFIX = "/api/v1"
+
+class RateLimitPolicy:
+    """A budget of `calls` units per `period` seconds
+
+    `path` matches exactly, or as a prefix when it ends with "/"; None matches
+    every path. `scope` picks the bucket: "ip", "principal" (verified token
+    subject, else IP), "ip_username" (IP plus the username in a JSON body,
+    for login) or "global" (one bucket for everyone).
+    `cost` is how many units a matching request uses. Policies naming the
+    same `bucket` share one budget; per bucket only the first match applies.
+    """
+
+    def __init__(self, name: str, calls: int, period: float, path: Optional[str] = None,
+                 methods: Optional[Iterable[str]] = None, scope: str = "ip", cost: int = 1,
+                 bucket: Optional[str] = None):
+        if scope not in ("ip", "principal", "ip_username", "global"):
+            raise ValueError(f"Unknown rate limit scope: {scope}")
+        self.name = name
+        self.calls = calls
+        self.period = period
+        self.path = path
+        self.methods: Optional[FrozenSet[str]] = frozenset(m.upper() for m in methods) if methods else None
+        self.scope = scope
+        self.cost = cost
+        self.bucket = bucket or name
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        if self.path is None:
+            return True
+        if self.path.endswith("/"):
+            return path.startswith(self.path)
+        return path == self.path
+
+PRINCIPAL_CALLS = int(os.getenv('RATE_LIMIT_PRINCIPAL_CALLS', 600))
+PRINCIPAL_PERIOD = float(os.getenv('RATE_LIMIT_PRINCIPAL_PERIOD', 60))
+LOGIN_PERIOD = float(os.getenv('RATE_LIMIT_LOGIN_PERIOD', 60))
+
+# Every bucket with a matching policy is charged, all together. Routes put
+# their weight on the shared per-principal budget via bucket="principal";
+# list them before the catch-all entry.
+RATE_LIMIT_POLICIES: List[RateLimitPolicy] = [
+    # Baseline per client IP
+    RateLimitPolicy("ip", calls=int(os.getenv('RATE_LIMIT_CALLS', 1000)), period=float(os.getenv('RATE_LIMIT_PERIOD', 1))),
+
+    # Login does a DB lookup and a password hash. Guessing is limited per
+    # IP + username, so a site behind one NAT can still log in everyone at
+    # shift change; the looser per-IP budget caps trying many usernames.
+    RateLimitPolicy("login", calls=int(os.getenv('RATE_LIMIT_LOGIN_CALLS', 10)), period=LOGIN_PERIOD,
+                    path=f"{API_PREFIX}/auth/login", methods=["POST"], scope="ip_username"),
+    RateLimitPolicy("login_ip", calls=int(os.getenv('RATE_LIMIT_LOGIN_IP_CALLS', 300)), period=LOGIN_PERIOD,
+                    path=f"{API_PREFIX}/auth/login", methods=["POST"]),
+    RateLimitPolicy("refresh", calls=30, period=60, path=f"{API_PREFIX}/auth/refresh", methods=["POST"], scope="principal"),
+    RateLimitPolicy("change_password", calls=5, period=300, path=f"{API_PREFIX}/auth/change-password", methods=["POST"], scope="principal"),
+    RateLimitPolicy("account_import", calls=10, period=3600, path=f"{API_PREFIX}/accounts/bulk", methods=["POST"], scope="principal"),
+
+    # Chat completion endpoints (when added) get their own budget, e.g.
+    # RateLimitPolicy("chat_completion", calls=20, period=60, path=f"{API_PREFIX}/chat/", methods=["POST"], scope="principal"),
+
+    # Per-principal budget shared by every API call, weighted by cost
+    RateLimitPolicy("account_search", PRINCIPAL_CALLS, PRINCIPAL_PERIOD, path=f"{API_PREFIX}/accounts/search", methods=["GET"], scope="principal", cost=5, bucket="principal"),
+    RateLimitPolicy("account_export", PRINCIPAL_CALLS, PRINCIPAL_PERIOD, path=f"{API_PREFIX}/accounts/export", methods=["GET"], scope="principal", cost=100, bucket="principal"),
+    RateLimitPolicy("account_import_weight", PRINCIPAL_CALLS, PRINCIPAL_PERIOD, path=f"{API_PREFIX}/accounts/bulk", methods=["POST"], scope="principal", cost=50, bucket="principal"),
+    RateLimitPolicy("principal", PRINCIPAL_CALLS, PRINCIPAL_PERIOD, path=f"{API_PREFIX}/", scope="principal"),
+]
+
+# Never limited: orchestrator probes and scrapes must not fail because of a busy client IP
+EXEMPT_PATH_PREFIXES = ("/health", "/metrics")
+
+def match_policies(method: str, path: str, policies: Optional[List[RateLimitPolicy]] = None) -> List[RateLimitPolicy]:
+    """Policies applying to a request: the first match of each bucket"""
+    if path.startswith(EXEMPT_PATH_PREFIXES):
+        return []
+    matched = {}
+    for policy in (RATE_LIMIT_POLICIES if policies is None else policies):
+        if policy.bucket not in matched and policy.matches(method, path):
+            matched[policy.bucket] = policy
+    return list(matched.values())
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import time
+
+import jwt
+from starlette.datastructures import Headers
+
+from api.middleware.ratelimit.limiter import RateLimiter
+from api.middleware.ratelimit.middleware import RateLimitMiddleware, get_principal, login_username
+from api.middleware.ratelimit.policies import RateLimitPolicy, match_policies
+
+LOGIN = "/api/v1/auth/login"
+
+def names(method, path):
+    return sorted(policy.name for policy in match_policies(method, path))
+
+def test_probes_and_scrapes_are_exempt():
+    assert match_policies("GET", "/health/ready") == []
+    assert match_policies("GET", "/metrics") == []
+
+def test_login_is_limited_per_ip_username_and_per_ip():
+    assert names("POST", LOGIN) == ["ip", "login", "login_ip", "principal"]
+    scopes = {policy.name: policy.scope for policy in match_policies("POST", LOGIN)}
+    assert scopes["login"] == "ip_username"
+    assert scopes["login_ip"] == "ip"
+
+def test_weighted_route_takes_the_shared_principal_bucket():
+    matched = {policy.bucket: policy for policy in match_policies("GET", "/api/v1/accounts/search")}
+    # First match per bucket: the search weight, not the catch-all entry
+    assert matched["principal"].name == "account_search"
+    assert matched["principal"].cost == 5
+
+def test_method_and_prefix_matching():
+    policy = RateLimitPolicy("p", 1, 1, path="/api/v1/chat/", methods=["post"])
+    assert policy.matches("POST", "/api/v1/chat/completions")
+    assert not policy.matches("GET", "/api/v1/chat/completions")
+    assert not policy.matches("POST", "/api/v1/chatx")
+
+def token(secret):
+    return jwt.encode({"sub": "subject-1", "exp": int(time.time()) + 60}, secret, algorithm="HS256")
+
+def test_principal_requires_a_valid_signature():
+    secret = os.getenv("SECRET_KEY", "Thaco@1234")
+    assert get_principal(Headers({"authorization": f"Bearer {token(secret)}"})) == "sub:subject-1"
+    assert get_principal(Headers({"authorization": f"Bearer {token('forged')}"})) is None
+    assert get_principal(Headers({"x-api-key": "anything"})) is None
+
+def test_login_username_is_normalized():
+    assert login_username(b'{"username": " Admin "}') == login_username(b'{"username": "admin"}')
+    assert login_username(b'not json') is None
+    assert login_username(b'{"username": 1}') is None
+
+def test_gcra_allows_the_budget_then_rejects():
+    limiter = RateLimiter()
+
+    async def run():
+        results = [await limiter.hit("k", calls=3, period=60) for _ in range(4)]
+        return [result.allowed for result in results], results[-1].retry_after
+
+    allowed, retry_after = asyncio.run(run())
+    assert allowed == [True, True, True, False]
+    assert 0 < retry_after <= 20
+
+def test_gcra_charges_all_budgets_or_none():
+    limiter = RateLimiter()
+
+    async def run():
+        await limiter.hit("small", calls=1, period=60)
+        denied = await limiter.hit_many([("large", 10, 60, 1), ("small", 1, 60, 1)])
+        large = await limiter.hit("large", calls=10, period=60)
+        return denied, large
+
+    denied, large = asyncio.run(run())
+    assert [result.allowed for result in denied] == [False, False]
+    # The refused call did not use any of the large budget
+    assert large.remaining == 9
+
+def call_login(middleware, username, ip="10.0.0.1"):
+    body = json.dumps({"username": username, "password": "x"}).encode()
+    scope = {"type": "http", "method": "POST", "path": LOGIN, "headers": [], "client": (ip, 1234)}
+    sent = []
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"]
+
+def test_login_budget_is_per_username_behind_one_ip():
+    received = []
+
+    async def app(scope, receive, send):
+        # The body read by the limiter is replayed to the application
+        received.append((await receive())["body"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    policies = [
+        RateLimitPolicy("login", 2, 60, path=LOGIN, methods=["POST"], scope="ip_username"),
+        RateLimitPolicy("login_ip", 100, 60, path=LOGIN, methods=["POST"]),
+    ]
+    middleware = RateLimitMiddleware(app, policies=policies, limiter=RateLimiter())
+    assert [call_login(middleware, "alice") for _ in range(3)] == [200, 200, 429]
+    assert call_login(middleware, "bob") == 200
+    assert json.loads(received[0])["username"] == "alice"
@@ -0,0 +1,78 @@
+import os
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from api.middleware.metrics.middleware import route_template
+from api.initialize.tracing import Sampler, SpanExporter, Trace, end_trace, parse_traceparent, span_exporter, start_trace
+
+def default_server_timing() -> str:
+    return "request" if os.getenv('ENVIRONMENT', 'production').lower() == "dev" else "off"
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a trace per request when it is needed
+
+    A request is traced when it is sampled for export (TRACE_SAMPLE_RATE; a
+    sampled W3C traceparent from the caller only counts with
+    TRACE_TRUST_PARENT=true, e.g. behind a gateway that sets it) or when it
+    asks for a timing breakdown with `X-Server-Timing: 1`
+    (TRACE_SERVER_TIMING=request; "always" adds it to every response, "off"
+    never). Server-Timing exposes per-span timings to any client, so it
+    defaults to "request" only with ENVIRONMENT=dev and "off" elsewhere.
+    Untraced requests only pay the header scan; spans opened during them
+    are no-ops.
+    """
+
+    def __init__(self, app: ASGIApp, sampler: Optional[Sampler] = None,
+                 exporter: Optional[SpanExporter] = None, server_timing: Optional[str] = None):
+        self.app = app
+        self.sampler = sampler or Sampler(
+            float(os.getenv('TRACE_SAMPLE_RATE', 0)),
+            respect_parent=os.getenv('TRACE_TRUST_PARENT', 'false').lower() == 'true'
+        )
+        self.exporter = exporter or span_exporter
+        self.server_timing = (server_timing or os.getenv('TRACE_SERVER_TIMING') or default_server_timing()).lower()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        server_timing = self.server_timing == "always"
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+            elif name == b"x-server-timing" and self.server_timing == "request":
+                server_timing = value not in (b"", b"0", b"false")
+        export = self.exporter.enabled and self.sampler.should_sample(parent[2] if parent else None)
+        if not export and not server_timing:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        trace = Trace(
+            trace_id=parent[0] if parent else None,
+            parent_id=parent[1] if parent else None,
+            export=export,
+            server_timing=server_timing
+        )
+        root = trace.start_root(f"{method} {scope['path']}", {"http.method": method, "http.target": scope["path"]})
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if trace.server_timing:
+                    MutableHeaders(scope=message).append("Server-Timing", trace.server_timing_header())
+            await send(message)
+
+        token = start_trace(trace)
+        try:
+            with root:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            end_trace(token)
+            # The route template is only known once the router has matched
+            root.name = f"{method} {route_template(scope)}"
+            root.set_attribute("http.route", route_template(scope))
+            if export:
+                self.exporter.submit(trace)
@@ -0,0 +1,50 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.initialize.tracing import Sampler
+from api.middleware.tracing.middleware import TracingMiddleware
+
+SAMPLED_PARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+class RecordingExporter:
+    enabled = True
+
+    def __init__(self):
+        self.traces = []
+
+    def submit(self, trace):
+        self.traces.append(trace)
+
+def build(monkeypatch, environment, **kwargs):
+    monkeypatch.setenv("ENVIRONMENT", environment)
+    monkeypatch.delenv("TRACE_SERVER_TIMING", raising=False)
+    monkeypatch.delenv("TRACE_TRUST_PARENT", raising=False)
+    exporter = RecordingExporter()
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    app.add_middleware(TracingMiddleware, exporter=exporter, **kwargs)
+    return TestClient(app), exporter
+
+def test_server_timing_is_off_outside_dev(monkeypatch):
+    client, _ = build(monkeypatch, "production")
+    response = client.get("/ping", headers={"X-Server-Timing": "1"})
+    assert "server-timing" not in response.headers
+
+def test_server_timing_on_request_in_dev(monkeypatch):
+    client, _ = build(monkeypatch, "dev")
+    assert "server-timing" in client.get("/ping", headers={"X-Server-Timing": "1"}).headers
+    assert "server-timing" not in client.get("/ping").headers
+
+def test_inbound_sampled_flag_is_ignored_by_default(monkeypatch):
+    client, exporter = build(monkeypatch, "production")
+    client.get("/ping", headers={"traceparent": SAMPLED_PARENT})
+    assert exporter.traces == []
+
+def test_inbound_sampled_flag_is_followed_when_trusted(monkeypatch):
+    client, exporter = build(monkeypatch, "production", sampler=Sampler(respect_parent=True))
+    client.get("/ping", headers={"traceparent": SAMPLED_PARENT})
+    assert [trace.trace_id for trace in exporter.traces] == ["4bf92f3577b34da6a3ce929d0e0e4736"]
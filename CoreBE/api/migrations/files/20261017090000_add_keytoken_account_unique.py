@@ -0,0 +1,37 @@
+"""
+Migration: add_keytoken_account_unique
+Description: One keytoken row per account so login can upsert it
+Created: 2026-10-17T09:00:00
+"""
+
+async def upgrade(conn):
+    """
+    Apply migration changes
+    """
+    # Giữ lại bản ghi mới nhất của mỗi account trước khi thêm unique constraint
+    sql = """
+    DELETE FROM keytoken k
+    USING keytoken newer
+    WHERE k.account_id = newer.account_id
+      AND (k.updated_at, k.id) < (newer.updated_at, newer.id);
+
+    DROP INDEX IF EXISTS idx_keytoken_account_id;
+
+    ALTER TABLE keytoken
+        ADD CONSTRAINT uq_keytoken_account_id UNIQUE (account_id);
+    """
+    
+    await conn.execute(sql)
+
+
+async def downgrade(conn):
+    """
+    Rollback migration changes
+    """
+    sql = """
+    ALTER TABLE keytoken DROP CONSTRAINT IF EXISTS uq_keytoken_account_id;
+
+    CREATE INDEX IF NOT EXISTS idx_keytoken_account_id ON keytoken(account_id);
+    """
+    
+    await conn.execute(sql)
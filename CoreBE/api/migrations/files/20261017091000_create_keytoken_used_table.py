@@ -0,0 +1,52 @@
+"""
+Migration: create_keytoken_used_table
+Description: Move used refresh tokens out of keytoken.refresh_tokens_used into an indexed digest table
+Created: 2026-10-17T09:10:00
+"""
+
+async def upgrade(conn):
+    """
+    Apply migration changes
+    """
+    # Lưu SHA-256 digest (32 bytes) của refresh token đã dùng, hết hạn theo TTL refresh token
+    sql = """
+    CREATE TABLE IF NOT EXISTS keytoken_used (
+        token_digest BYTEA NOT NULL,
+        account_id UUID NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (token_digest),
+        CONSTRAINT chk_keytoken_used_digest CHECK (octet_length(token_digest) = 32),
+        CONSTRAINT fk_keytoken_used_account_id FOREIGN KEY (account_id) REFERENCES account(id) ON DELETE CASCADE
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_keytoken_used_expires_at ON keytoken_used(expires_at);
+
+    COMMENT ON TABLE keytoken_used IS 'refresh tokens already rotated (reuse detection)';
+
+    INSERT INTO keytoken_used (token_digest, account_id, expires_at)
+    SELECT sha256(convert_to(used.token, 'UTF8')), k.account_id, k.updated_at + INTERVAL '168 hours'
+    FROM keytoken k
+    CROSS JOIN LATERAL jsonb_array_elements_text(COALESCE(k.refresh_tokens_used, '[]'::jsonb)) AS used(token)
+    ON CONFLICT (token_digest) DO NOTHING;
+
+    ALTER TABLE keytoken DROP COLUMN IF EXISTS refresh_tokens_used;
+    """
+    
+    await conn.execute(sql)
+
+
+async def downgrade(conn):
+    """
+    Rollback migration changes
+    """
+    # Digest không thể khôi phục lại token gốc nên danh sách cũ bắt đầu lại từ rỗng
+    sql = """
+    ALTER TABLE keytoken ADD COLUMN IF NOT EXISTS refresh_tokens_used JSONB DEFAULT NULL;
+
+    UPDATE keytoken SET refresh_tokens_used = '[]'::jsonb;
+
+    DROP TABLE IF EXISTS keytoken_used;
+    """
+    
+    await conn.execute(sql)
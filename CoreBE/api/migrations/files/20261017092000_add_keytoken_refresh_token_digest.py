@@ -0,0 +1,46 @@
+"""
+Migration: add_keytoken_refresh_token_digest
+Description: Store a SHA-256 digest of the refresh token with a unique index instead of the raw JWT
+Created: 2026-10-17T09:20:00
+"""
+
+async def upgrade(conn):
+    """
+    Apply migration changes
+    """
+    # Backfill digest từ token hiện có, sau đó bỏ cột TEXT chứa JWT đầy đủ
+    sql = """
+    ALTER TABLE keytoken ADD COLUMN IF NOT EXISTS refresh_token_digest BYTEA;
+
+    UPDATE keytoken
+    SET refresh_token_digest = sha256(convert_to(refresh_token, 'UTF8'))
+    WHERE refresh_token_digest IS NULL;
+
+    ALTER TABLE keytoken
+        ALTER COLUMN refresh_token_digest SET NOT NULL,
+        ADD CONSTRAINT chk_keytoken_refresh_token_digest CHECK (octet_length(refresh_token_digest) = 32);
+
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_keytoken_refresh_token_digest ON keytoken(refresh_token_digest);
+
+    ALTER TABLE keytoken DROP COLUMN IF EXISTS refresh_token;
+    """
+    
+    await conn.execute(sql)
+
+
+async def downgrade(conn):
+    """
+    Rollback migration changes
+    """
+    # Token gốc không khôi phục được từ digest: các phiên hiện tại phải đăng nhập lại
+    sql = """
+    ALTER TABLE keytoken ADD COLUMN IF NOT EXISTS refresh_token TEXT NOT NULL DEFAULT '';
+
+    ALTER TABLE keytoken ALTER COLUMN refresh_token DROP DEFAULT;
+
+    DROP INDEX IF EXISTS uq_keytoken_refresh_token_digest;
+
+    ALTER TABLE keytoken DROP COLUMN IF EXISTS refresh_token_digest;
+    """
+    
+    await conn.execute(sql)
@@ -0,0 +1,67 @@
+"""
+Migration: add_account_active_unique_indexes
+Description: Partial unique indexes on username and email for accounts that are not deleted
+Created: 2026-10-17T09:30:00
+"""
+
+# Số giá trị trùng tối đa được liệt kê trong thông báo lỗi
+MAX_REPORTED_DUPLICATES = 20
+
+async def find_duplicates(conn, column: str):
+    """
+    Các giá trị bị trùng giữa các account chưa xoá, kèm id của các account đó
+    """
+    sql = f"""
+    SELECT {column} AS value, array_agg(id::text ORDER BY create_at, id) AS ids
+    FROM account
+    WHERE is_deleted = false
+    GROUP BY {column}
+    HAVING COUNT(*) > 1
+    ORDER BY {column}
+    """
+    return await conn.fetch(sql)
+
+
+async def upgrade(conn):
+    """
+    Apply migration changes
+    """
+    # Trước đây chỉ kiểm tra trùng email bằng COUNT, không kiểm tra username, nên dữ liệu
+    # cũ có thể đã trùng. Không tự xoá account (còn keytoken, created_by trỏ tới), mà dừng
+    # migration và liệt kê các bản ghi trùng để xử lý tay (đổi username/email hoặc is_deleted = true)
+    problems = []
+    for column in ("username", "email"):
+        duplicates = await find_duplicates(conn, column)
+        if duplicates:
+            lines = [f"  {column}={row['value']!r}: {', '.join(row['ids'])}" for row in duplicates[:MAX_REPORTED_DUPLICATES]]
+            if len(duplicates) > MAX_REPORTED_DUPLICATES:
+                lines.append(f"  ... và {len(duplicates) - MAX_REPORTED_DUPLICATES} giá trị khác")
+            problems.append(f"{len(duplicates)} {column} bị trùng giữa các account chưa xoá:\n" + "\n".join(lines))
+    if problems:
+        raise RuntimeError(
+            "Không thể tạo unique index, cần xử lý dữ liệu trùng trước:\n" + "\n".join(problems)
+        )
+
+    # Chỉ áp dụng cho account chưa bị xoá; cũng phục vụ lookup theo username/email khi đăng nhập
+    sql = """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_account_username_active
+        ON account (username) WHERE is_deleted = false;
+
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_account_email_active
+        ON account (email) WHERE is_deleted = false;
+    """
+    
+    await conn.execute(sql)
+
+
+async def downgrade(conn):
+    """
+    Rollback migration changes
+    """
+    sql = """
+    DROP INDEX IF EXISTS uq_account_email_active;
+
+    DROP INDEX IF EXISTS uq_account_username_active;
+    """
+    
+    await conn.execute(sql)
@@ -0,0 +1,28 @@
+"""
+Migration: add_account_create_at_id_index
+Description: Index for keyset pagination of active accounts on (create_at, id)
+Created: 2026-10-17T09:40:00
+"""
+
+async def upgrade(conn):
+    """
+    Apply migration changes
+    """
+    # Phục vụ phân trang keyset (mới nhất trước) và export theo cùng thứ tự
+    sql = """
+    CREATE INDEX IF NOT EXISTS idx_account_active_create_at_id
+        ON account (create_at DESC, id DESC) WHERE is_deleted = false;
+    """
+    
+    await conn.execute(sql)
+
+
+async def downgrade(conn):
+    """
+    Rollback migration changes
+    """
+    sql = """
+    DROP INDEX IF EXISTS idx_account_active_create_at_id;
+    """
+    
+    await conn.execute(sql)
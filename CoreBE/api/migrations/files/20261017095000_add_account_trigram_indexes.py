@@ -0,0 +1,41 @@
+"""
+Migration: add_account_trigram_indexes
+Description: pg_trgm GIN indexes on name, email and code of active accounts for fuzzy search
+Created: 2026-10-17T09:50:00
+"""
+
+async def upgrade(conn):
+    """
+    Apply migration changes
+    """
+    # GIN trigram index phục vụ cả ILIKE '%x%' và toán tử similarity (%)
+    sql = """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+    CREATE INDEX IF NOT EXISTS idx_account_name_trgm
+        ON account USING gin (name gin_trgm_ops) WHERE is_deleted = false;
+
+    CREATE INDEX IF NOT EXISTS idx_account_email_trgm
+        ON account USING gin (email gin_trgm_ops) WHERE is_deleted = false;
+
+    CREATE INDEX IF NOT EXISTS idx_account_code_trgm
+        ON account USING gin (code gin_trgm_ops) WHERE is_deleted = false;
+    """
+    
+    await conn.execute(sql)
+
+
+async def downgrade(conn):
+    """
+    Rollback migration changes
+    """
+    # Giữ lại extension pg_trgm vì có thể được dùng ở nơi khác
+    sql = """
+    DROP INDEX IF EXISTS idx_account_code_trgm;
+
+    DROP INDEX IF EXISTS idx_account_email_trgm;
+
+    DROP INDEX IF EXISTS idx_account_name_trgm;
+    """
+    
+    await conn.execute(sql)
@@ -9,7 +9,7 @@ class CreateAccount(BaseModel):
     email: str = Field(..., description="Email address of the user")
     username: str = Field(..., description="Username of the user")
     password: str = Field(..., description="Password of the user")
-    salt: str = Field(..., description="Salt of the user")
+    salt: str = Field("", description="Ignored: the stored password hash embeds its own salt")
     status: bool = Field(..., description="Status of the user")
     images: Optional[str] = Field(None, description="Path to user image")
     is_deleted: bool = Field(False, description="Whether the user is deleted or not")
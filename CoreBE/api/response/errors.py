@@ -26,4 +26,8 @@ class ErrorInternal(AppError):
 
 class ErrorBadRequest(AppError):
     def __init__(self, message: str = "Bad request"):
-        super().__init__(message=message, code=400) 
\ No newline at end of file
+        super().__init__(message=message, code=400) 
+
+class ErrorServiceUnavailable(AppError):
+    def __init__(self, message: str = "Service temporarily unavailable"):
+        super().__init__(message=message, code=503)
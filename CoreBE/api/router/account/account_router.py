@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from typing import Optional, List, Dict, Any
 from api.middleware.auth import AuthMiddleware
 from api.service.account.account import AccountService
-from api.initialize.postgres import PostgresInitializer
+from api.initialize.postgres import UnitOfWork, get_unit_of_work
 from api.models.account_model import CreateAccount
 from api.controller.account.account_controller import AccountController
 
@@ -14,10 +15,8 @@ account_router = APIRouter()
 auth = AuthMiddleware()
 
 # Dependency to get AccountController instance
-async def get_account_controller():
-    postgres = PostgresInitializer()
-    pool = await postgres.initialize()
-    account_service = AccountService(pool)
+async def get_account_controller(uow: UnitOfWork = Depends(get_unit_of_work)):
+    account_service = AccountService(uow)
     return AccountController(account_service)
 
 @account_router.post("", status_code=status.HTTP_201_CREATED)
@@ -31,3 +30,60 @@ async def create_account(
         account_data=account_data
     )
 
+@account_router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def import_accounts(
+    request: Request,
+    created_by: str = Query(..., description="Account creating the imported accounts"),
+    account_controller: AccountController = Depends(get_account_controller),
+    auth_token: HTTPAuthorizationCredentials = Depends(auth.get_bearer_token)
+) -> Dict[str, Any]:
+    """Bulk create accounts from a CSV (text/csv, with header) or JSON lines body"""
+    return await account_controller.import_accounts(
+        body=await request.body(),
+        content_type=request.headers.get("content-type", ""),
+        created_by=created_by
+    )
+
+@account_router.get("", status_code=status.HTTP_200_OK)
+async def list_accounts(
+    limit: int = Query(20, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    include_total: bool = Query(False, description="Also return the exact number of accounts"),
+    account_controller: AccountController = Depends(get_account_controller),
+    auth_token: HTTPAuthorizationCredentials = Depends(auth.get_bearer_token)
+) -> Dict[str, Any]:
+    """List accounts, newest first, with cursor pagination"""
+    return await account_controller.list_accounts(
+        limit=limit,
+        cursor=cursor,
+        include_total=include_total
+    )
+
+@account_router.get("/export", status_code=status.HTTP_200_OK)
+async def export_accounts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    account_controller: AccountController = Depends(get_account_controller),
+    auth_token: HTTPAuthorizationCredentials = Depends(auth.get_bearer_token)
+) -> StreamingResponse:
+    """Stream every account as NDJSON or CSV"""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        account_controller.account_service.export_accounts(format=format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="accounts.{format}"'}
+    )
+
+@account_router.get("/search", status_code=status.HTTP_200_OK)
+async def search_accounts(
+    q: str = Query(..., min_length=3, max_length=100, description="Part of the name, email or code"),
+    limit: int = Query(20, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    account_controller: AccountController = Depends(get_account_controller),
+    auth_token: HTTPAuthorizationCredentials = Depends(auth.get_bearer_token)
+) -> Dict[str, Any]:
+    """Fuzzy search accounts, best match first"""
+    return await account_controller.search_accounts(
+        query=q,
+        limit=limit,
+        cursor=cursor
+    )
@@ -3,7 +3,7 @@ from fastapi.security import HTTPAuthorizationCredentials
 from typing import Optional, List, Dict, Any
 from api.middleware.auth import AuthMiddleware
 from api.service.authentication.auth import AuthService
-from api.initialize.postgres import PostgresInitializer
+from api.initialize.postgres import UnitOfWork, get_unit_of_work
 from api.models.login import LoginInput, LoginOutput, ChangePasswordInput
 from ...controller.auth.auth import AuthController
 
@@ -13,10 +13,8 @@ auth_router = APIRouter()
 # Create auth middleware instance
 auth = AuthMiddleware()
 
-async def get_auth_service():
-    postgres = PostgresInitializer()
-    pool = await postgres.initialize()
-    return AuthService(pool)
+async def get_auth_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+    return AuthService(uow)
 
 async def get_auth_controller(auth_service: AuthService = Depends(get_auth_service)):
     return AuthController(auth_service)
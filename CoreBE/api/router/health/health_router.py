@@ -0,0 +1,20 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from api.initialize.health import health_monitor
+
+# Probe endpoints at the application root; they only read cached results
+health_router = APIRouter(include_in_schema=False)
+
+@health_router.get("/health/live")
+async def liveness():
+    """The worker's event loop is serving requests"""
+    return JSONResponse(health_monitor.liveness())
+
+@health_router.get("/health/ready")
+async def readiness():
+    """Last background check results; 503 while a critical dependency is down"""
+    code = status.HTTP_200_OK if health_monitor.is_ready() else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(health_monitor.readiness(), status_code=code)
+
+# Kept for existing callers, same as /health/ready
+health_router.add_api_route("/health", readiness, methods=["GET"])
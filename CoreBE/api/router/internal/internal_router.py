@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, status
+from typing import Dict, Any
+from api.middleware.auth import AuthMiddleware
+from api.initialize.postgres import pool_stats
+from api.initialize.statements import statement_registry
+from api.utils.auth.session_cache import session_cache
+from api.utils.response import create_response
+
+# Create auth middleware instance
+auth = AuthMiddleware()
+
+# Create router (operational endpoints, hidden from the public docs);
+# hiding them does not protect them, so every route requires a valid token
+internal_router = APIRouter(include_in_schema=False, dependencies=[Depends(auth.get_bearer_token)])
+
+@internal_router.get("/db/statements", status_code=status.HTTP_200_OK)
+async def get_statement_stats() -> Dict[str, Any]:
+    """Per-statement execution counts, prepared-statement hits and timings"""
+    return create_response(
+        message="Statement statistics",
+        data=statement_registry.snapshot()
+    )
+
+@internal_router.get("/db/pool", status_code=status.HTTP_200_OK)
+async def get_pool_stats() -> Dict[str, Any]:
+    """Pool size, in-use/idle/waiting counts, acquire latency and per-connection query counts"""
+    return create_response(
+        message="Pool statistics",
+        data=await pool_stats()
+    )
+
+@internal_router.get("/session-cache", status_code=status.HTTP_200_OK)
+async def get_session_cache_stats() -> Dict[str, Any]:
+    """In-process session cache size and hit rate of this worker"""
+    return create_response(
+        message="Session cache statistics",
+        data=session_cache.snapshot()
+    )
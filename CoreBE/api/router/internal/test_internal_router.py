@@ -0,0 +1,21 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.router.internal.internal_router import internal_router
+
+app = FastAPI()
+app.include_router(internal_router, prefix="/api/v1/internal")
+client = TestClient(app)
+
+def test_statement_stats_require_token():
+    assert client.get("/api/v1/internal/db/statements").status_code == 401
+
+def test_statement_stats_reject_invalid_token():
+    response = client.get("/api/v1/internal/db/statements", headers={"Authorization": "Bearer invalid"})
+    assert response.status_code == 401
+
+def test_pool_stats_require_token():
+    assert client.get("/api/v1/internal/db/pool").status_code == 401
+
+def test_session_cache_stats_require_token():
+    assert client.get("/api/v1/internal/session-cache").status_code == 401
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from api.utils.metrics.metrics import metrics
+
+# Prometheus scrape endpoint at the application root
+metrics_router = APIRouter(include_in_schema=False)
+
+@metrics_router.get("/metrics")
+async def get_metrics():
+    """Metrics of every worker on this host, in Prometheus text format"""
+    return PlainTextResponse(await metrics.collect(), media_type="text/plain; version=0.0.4; charset=utf-8")
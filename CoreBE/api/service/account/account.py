@@ -1,11 +1,37 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+import asyncio
 import asyncpg
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
 from ...sql.account import AccountQuery
+from ...initialize.postgres import DBExecutor, UnitOfWork, get_pool, get_replica_router, release_connection
+from ...utils.crypto.hasher import password_hasher
+from ...utils.response import encode_cursor, decode_cursor
+from ...global_config.global_val import global_instance
+from .account_import import IMPORT_COLUMNS, get_import_executor, parse_import_body, prepare_import_chunk
 from datetime import datetime
 import uuid
 
+logger = logging.getLogger(__name__)
+
+SEARCH_MIN_LENGTH = 3  # shorter queries cannot use the trigram indexes
+SEARCH_MAX_LENGTH = 100
+
+EXPORT_FIELDS = ["id", "number", "code", "name", "email", "username", "status", "images", "create_at", "created_by", "update_at"]
+EXPORT_BATCH_SIZE = 500
+
+# Partial unique indexes on active accounts -> client facing message
+UNIQUE_VIOLATION_MESSAGES = {
+    "uq_account_email_active": "Account with this email already exists",
+    "uq_account_username_active": "Account with this username already exists",
+}
+
 class AccountService:
-    def __init__(self, pool: asyncpg.Pool):
+    def __init__(self, pool: DBExecutor):
         self.pool = pool
 
     async def create_account(
@@ -22,12 +48,13 @@ class AccountService:
         created_by: str = None,
         is_deleted: bool = False,
     ) -> Dict[str, Any]:
-        """Create a new account"""
-        # Check if user with email already exists
-        result = await AccountQuery.get_account_by_email(self.pool, email)
-        if result and result.get('count', 0) > 0:
-            raise ValueError("Account with this email already exists")
-            
+        """Create a new account
+
+        The password is hashed with the password hashing pool; the new hash
+        embeds its own salt, so the `salt` sent by the client is not stored.
+        """
+        # Duplicate username/email among active accounts is rejected by the
+        # partial unique indexes, so no pre-check query is needed
         # Generate UUID and current timestamp
         account_id = str(uuid.uuid4())
         current_time = datetime.now()
@@ -35,32 +62,180 @@ class AccountService:
         # For the first account, created_by will be NULL
         # For subsequent accounts, created_by must reference an existing account
         if created_by is None:
-            # Check if this is the first account
-            check_first_account = """
-            SELECT COUNT(*) as count FROM account
-            """
-            async with self.pool.acquire() as conn:
-                count = await conn.fetchval(check_first_account)
-                if count > 0:
-                    raise ValueError("created_by is required for non-first accounts")
-        
-        return await AccountQuery.create_account(
-            self.pool,
-            id=account_id,
-            number=number,
-            code=code,
-            name=name,
-            email=email,
-            username=username,
-            password=password,
-            salt=salt,
-            created_at=current_time,
-            updated_at=current_time,
-            images=images,
-            status=status,
-            created_by=created_by,
-            is_deleted=is_deleted
-        )
+            if await AccountQuery.has_any_account(self.pool):
+                raise ValueError("created_by is required for non-first accounts")
+
+        # Hash holding no DB connection (the query above gave it back)
+        await release_connection(self.pool)
+        hashed_password = await password_hasher.hash(password)
+
+        try:
+            return await AccountQuery.create_account(
+                self.pool,
+                id=account_id,
+                number=number,
+                code=code,
+                name=name,
+                email=email,
+                username=username,
+                password=hashed_password,
+                salt="",
+                created_at=current_time,
+                updated_at=current_time,
+                images=images,
+                status=status,
+                created_by=created_by,
+                is_deleted=is_deleted
+            )
+        except asyncpg.UniqueViolationError as e:
+            message = UNIQUE_VIOLATION_MESSAGES.get(e.constraint_name, "Account already exists")
+            raise ValueError(message)
+
+    async def import_accounts(
+        self,
+        body: bytes,
+        content_type: str,
+        created_by: str
+    ) -> Dict[str, Any]:
+        """Bulk create accounts from a CSV or JSON lines payload"""
+        try:
+            creator_id = uuid.UUID(created_by)
+        except ValueError:
+            raise ValueError("created_by must be a valid UUID")
+
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, parse_import_body, body, content_type)
+        max_rows = int(os.getenv('ACCOUNT_IMPORT_MAX_ROWS', 100000))
+        if not rows:
+            raise ValueError("No accounts to import")
+        if len(rows) > max_rows:
+            raise ValueError(f"Too many accounts in one import (max {max_rows})")
+
+        # Validate and hash in worker processes, one chunk per task
+        chunk_size = int(os.getenv('ACCOUNT_IMPORT_CHUNK_SIZE', 2000))
+        current_time = datetime.now()
+        executor = get_import_executor()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, prepare_import_chunk, rows[i:i + chunk_size], creator_id, current_time)
+            for i in range(0, len(rows), chunk_size)
+        ])
+        records = [record for chunk_records, _ in results for record in chunk_records]
+        errors = [error for _, chunk_errors in results for error in chunk_errors]
+
+        if records:
+            errors.extend(await AccountQuery.import_accounts(self.pool, IMPORT_COLUMNS, records))
+        errors.sort(key=lambda error: error["line"])
+        return {
+            "total": len(rows),
+            "created": len(rows) - len(errors),
+            "failed": len(errors),
+            "errors": errors
+        }
+
+    async def list_accounts(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        include_total: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """List active accounts, newest first, one keyset page at a time"""
+        after = None
+        if cursor:
+            values = decode_cursor(cursor)
+            try:
+                after = (datetime.fromisoformat(values["c"]), uuid.UUID(values["i"]))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+
+        # One extra row tells whether there is a next page without counting
+        items = await AccountQuery.list_accounts(self.pool, limit + 1, after)
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor({"c": last["create_at"].isoformat(), "i": str(last["id"])})
+
+        total = await AccountQuery.count_active_accounts(self.pool) if include_total else None
+        return items, next_cursor, total
+
+    async def search_accounts(
+        self,
+        query: str,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Ranked fuzzy search, cached briefly in Redis per (query, page)"""
+        query = query.strip()
+        if len(query) < SEARCH_MIN_LENGTH:
+            raise ValueError(f"Search query must be at least {SEARCH_MIN_LENGTH} characters")
+        if len(query) > SEARCH_MAX_LENGTH:
+            raise ValueError(f"Search query must be at most {SEARCH_MAX_LENGTH} characters")
+
+        after = None
+        if cursor:
+            values = decode_cursor(cursor)
+            try:
+                after = (float(values["s"]), uuid.UUID(values["i"]))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+
+        cache_key = "ACCOUNT_SEARCH_" + hashlib.sha1(f"{query.lower()}|{limit}|{cursor or ''}".encode('utf-8')).hexdigest()
+        redis_client = global_instance.redis_client
+        if redis_client is not None:
+            try:
+                cached = await redis_client.get(cache_key)
+                if cached:
+                    return json.loads(cached)
+            except Exception as e:
+                logger.warning(f"Account search cache read failed: {str(e)}")
+
+        items = await AccountQuery.search_accounts(self.pool, query, limit + 1, after)
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor({"s": last["score"], "i": str(last["id"])})
+        result = {
+            "items": json.loads(json.dumps(items, default=str)),
+            "next_cursor": next_cursor
+        }
+
+        if redis_client is not None:
+            try:
+                ttl = int(os.getenv('ACCOUNT_SEARCH_CACHE_TTL', 30))
+                await redis_client.set(cache_key, json.dumps(result), ex=ttl)
+            except Exception as e:
+                logger.warning(f"Account search cache write failed: {str(e)}")
+        return result
+
+    async def export_accounts(self, format: str = "ndjson") -> AsyncIterator[str]:
+        """Stream all active accounts as NDJSON or CSV
+
+        Runs after the request's unit of work is closed (the response body is
+        streamed), so it uses a connection of its own, on a replica if any.
+        """
+        uow = UnitOfWork(await get_pool(), replicas=await get_replica_router())
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer) if format == "csv" else None
+            if writer is not None:
+                writer.writerow(EXPORT_FIELDS)
+            count = 0
+            async for account in AccountQuery.stream_accounts(uow):
+                if writer is not None:
+                    writer.writerow([account[field] for field in EXPORT_FIELDS])
+                else:
+                    buffer.write(json.dumps(account, default=str, ensure_ascii=False))
+                    buffer.write("\n")
+                count += 1
+                if count % EXPORT_BATCH_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            await uow.close()
 
     async def get_account_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get account by email"""
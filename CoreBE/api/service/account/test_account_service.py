@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from api.service.account import account
+from api.service.account.account import AccountService
+from api.sql.account import AccountQuery
+from api.utils.crypto import hasher
+from api.utils.crypto.hasher import PasswordHashPool, identify, verify_password
+
+@pytest.fixture(autouse=True)
+def cheap_hasher(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_ALGORITHM", "scrypt")
+    monkeypatch.setenv("PASSWORD_HASH_SCRYPT_LN", "4")
+    monkeypatch.setattr(hasher, "_hashers", {})
+    pool = PasswordHashPool(workers=1, max_queue=8)
+    monkeypatch.setattr(account, "password_hasher", pool)
+    yield
+    pool.shutdown()
+
+def test_create_account_stores_a_password_hash(monkeypatch):
+    stored = {}
+
+    async def has_any_account(pool):
+        return True
+
+    async def create_account(pool, **row):
+        stored.update(row)
+        return row
+
+    monkeypatch.setattr(AccountQuery, "has_any_account", has_any_account)
+    monkeypatch.setattr(AccountQuery, "create_account", create_account)
+    asyncio.run(AccountService(None).create_account(
+        number=1, code="TK_1", name="Admin", email="admin@example.com", username="admin",
+        password="secret", salt="client salt", images=None, created_by="creator"
+    ))
+    assert identify(stored["password"]) == "scrypt"
+    assert stored["salt"] == ""
+    assert verify_password(stored["password"], "secret") == (True, False)
@@ -1,13 +1,17 @@
 from typing import Optional, Dict, Any, Tuple
+import asyncio
+import logging
 import asyncpg
 from ...sql.account import AccountQuery
 from ...sql.keytoken import KeyTokenQuery
+from ...initialize.postgres import DBExecutor, get_pool, release_connection
 from datetime import datetime, timedelta
-from ...utils.crypto.crypto import Crypto
+from ...utils.crypto.hasher import password_hasher, identify
 from ...utils.utils import TokenGenerator
-from ...utils.auth.jwt import create_token, create_refresh_token
-import uuid
-import json
+from ...utils.auth.jwt import create_token, create_refresh_token, revocation_key
+from ...utils.auth.session import save_session, load_session
+from ...utils.auth.session_cache import session_cache
+from ...initialize.tracing import span
 from api.global_config.global_val import global_instance
 from ...const.const import REFRESH_TOKEN
 from ...models.login import LoginInput, LoginOutput, RefreshTokenInput, ChangePasswordInput
@@ -15,82 +19,86 @@ from ...response.errors import ErrorNotAuth, ErrorForbidden, ErrorInternal, Erro
 import traceback
 from fastapi import Request
 
+logger = logging.getLogger(__name__)
+
+# Keeps background rehash tasks referenced until they finish
+_rehash_tasks = set()
 
 class AuthService:
-    def __init__(self, pool: asyncpg.Pool):
+    def __init__(self, pool: DBExecutor):
         self.pool = pool
 
+    async def _get_session(self, request: Request) -> Optional[Dict[str, Any]]:
+        """Session of the authenticated subject, reusing what the auth dependency read"""
+        session = getattr(request.state, 'session', None)
+        if session is None:
+            session = await load_session(global_instance.redis_client, request.state.subject_uuid)
+        return session
+
+    def _schedule_rehash(self, account_id, old_hash: str, password: str):
+        """Upgrade a legacy or outdated hash in the background, after the password matched"""
+        task = asyncio.create_task(self._rehash(account_id, old_hash, password))
+        _rehash_tasks.add(task)
+        task.add_done_callback(_rehash_tasks.discard)
+
+    async def _rehash(self, account_id, old_hash: str, password: str):
+        try:
+            new_hash = await password_hasher.hash(password)
+            # Runs after the request's unit of work is closed, so use the pool;
+            # the salt is part of the new hash, the column keeps legacy salts only
+            if await AccountQuery.upgrade_password_hash(await get_pool(), account_id, new_hash, "", old_hash):
+                logger.info(f"Upgraded password hash of account {account_id} to {identify(new_hash)}")
+        except Exception as e:
+            # Best effort: the next successful login tries again
+            logger.warning(f"Could not upgrade password hash of account {account_id}: {str(e)}")
+
     async def login(self, input_data: LoginInput) -> Tuple[int, LoginOutput, Optional[Exception]]:
         try:
             # Check if user with username exists
             item_account = await AccountQuery.get_account_by_username(self.pool, input_data.username)
-            if not item_account:
-                return 401, None, ErrorNotAuth()
 
-            # Verify password
-            if not Crypto.matching_password(item_account["password"], input_data.password, item_account["salt"]):
+            # Verify password in the hashing pool, holding no DB connection meanwhile;
+            # unknown usernames are checked against a dummy hash so they take as long
+            await release_connection(self.pool)
+            if item_account:
+                encoded, salt = item_account["password"], item_account["salt"]
+            else:
+                encoded, salt = await password_hasher.dummy_hash(), ""
+            valid, needs_rehash = await password_hasher.verify(encoded, input_data.password, salt)
+            if not item_account or not valid:
                 return 401, None, ErrorNotAuth()
-            
+
             # Check if account is active
             if item_account["status"] == False:
                 return 403, None, ErrorForbidden("Account is Locked")
 
+            if needs_rehash:
+                self._schedule_rehash(item_account["id"], item_account["password"], input_data.password)
+
             # Generate tokens
             subtoken = TokenGenerator.generate_cli_token_uuid(item_account["number"])
-            
-            # Get account info
-            result_tuple = await AccountQuery.get_account_by_id(self.pool, item_account["id"])
-            if result_tuple is None:
-                return 500, None, ErrorInternal("Failed to retrieve account information (unexpected None from DB query)")
-
-            info_account, err = result_tuple
-            if err is not None:
-                return 500, None, ErrorInternal("Error getting account information")
+            with span("auth.create_tokens"):
+                access_token = create_token(subtoken)
+                refresh_token = create_refresh_token(subtoken)
 
             try:
-                # Convert UUID and datetime objects to strings for JSON serialization
-                for key, value in info_account.items():
-                    if isinstance(value, uuid.UUID):
-                        info_account[key] = str(value)
-                    elif isinstance(value, datetime):
-                        info_account[key] = value.isoformat()
-                info_account_json = json.dumps(info_account)
+                success = await KeyTokenQuery.upsert_key(self.pool, item_account["id"], refresh_token)
+                if not success:
+                    return 500, None, ErrorInternal("Failed to save refresh token")
             except Exception as e:
-                return 500, None, ErrorInternal(f"Error converting account info to JSON: {str(e)}")
-                
+                return 500, None, ErrorInternal(f"Error saving refresh token: {str(e)}")
+
             try:
-                await global_instance.redis_client.set(
-                    subtoken,
-                    info_account_json,
-                    ex=REFRESH_TOKEN * 3600  # Convert hours to seconds
-                )
+                with span("auth.save_session"):
+                    await save_session(
+                        global_instance.redis_client,
+                        subtoken,
+                        item_account,
+                        REFRESH_TOKEN * 3600  # Convert hours to seconds
+                    )
             except Exception as e:
                 return 500, None, ErrorInternal(f"Error setting Redis: {str(e)}")
 
-            # Create tokens
-            access_token = create_token(subtoken)
-            refresh_token = create_refresh_token(subtoken)
-            
-            try:
-                KeyToken = await KeyTokenQuery.count_by_account(self.pool, item_account["id"])
-            except Exception as e:
-                return 400, None, ErrorBadRequest(f"Error count keytoken account: {str(e)}")
-                
-            if KeyToken > 0:
-                try:
-                    success = await KeyTokenQuery.update_refresh_token(self.pool, item_account["id"], refresh_token)
-                    if not success:
-                        return 500, None, ErrorInternal("Failed to update refresh token")
-                except Exception as e:
-                    return 500, None, ErrorInternal(f"Error update data: {str(e)}")
-            else:
-                try:
-                    success = await KeyTokenQuery.insert_key(self.pool, refresh_token, item_account["id"])
-                    if not success:
-                        return 500, None, ErrorInternal("Failed to insert key token")
-                except Exception as e:
-                    return 500, None, ErrorInternal(f"Error insert data: {str(e)}")
-                    
             # Prepare output
             output = LoginOutput(
                 id=str(item_account["id"]),
@@ -119,11 +127,9 @@ class AuthService:
 
             # Get user info from Redis cache
             try:
-                user_info = await global_instance.redis_client.get(subject_uuid)
-                if not user_info:
+                user_data = await self._get_session(request)
+                if not user_data:
                     return 500, None, ErrorInternal("User info not found in cache")
-                
-                user_data = json.loads(user_info)
             except Exception as e:
                 return 500, None, ErrorInternal(f"Error getting user info from cache: {str(e)}")
 
@@ -136,6 +142,7 @@ class AuthService:
             
             # Set token in blacklist with expiration
             await global_instance.redis_client.set(redis_key, "1", ex=REFRESH_TOKEN * 3600)  # Convert hours to seconds
+            await session_cache.publish(subject_uuid, user_data["id"])
             
             # Delete user's refresh token from database
             try:
@@ -168,11 +175,9 @@ class AuthService:
 
             # Get user info from Redis cache
             try:
-                user_info = await global_instance.redis_client.get(subject_uuid)
-                if not user_info:
+                user_data = await self._get_session(request)
+                if not user_data:
                     return 500, None, ErrorInternal("User info not found in cache")
-                
-                user_data = json.loads(user_info)
             except Exception as e:
                 return 500, None, ErrorInternal(f"Error getting user info from cache: {str(e)}")
 
@@ -204,42 +209,36 @@ class AuthService:
             if err is not None:
                 return 500, None, ErrorInternal("Error getting account information")
 
-            try:
-                # Convert UUID and datetime objects to strings for JSON serialization
-                for key, value in info_account.items():
-                    if isinstance(value, uuid.UUID):
-                        info_account[key] = str(value)
-                    elif isinstance(value, datetime):
-                        info_account[key] = value.isoformat()
-                info_account_json = json.dumps(info_account)
-            except Exception as e:
-                return 500, None, ErrorInternal(f"Error converting account info to JSON: {str(e)}")
-
             # Update Redis cache
             try:
-                await global_instance.redis_client.set(
+                await save_session(
+                    global_instance.redis_client,
                     subtoken,
-                    info_account_json,
-                    ex=REFRESH_TOKEN * 3600  # Convert hours to seconds
+                    info_account,
+                    REFRESH_TOKEN * 3600  # Convert hours to seconds
                 )
             except Exception as e:
                 return 500, None, ErrorInternal(f"Error setting Redis: {str(e)}")
 
             # Create new tokens
-            access_token = create_token(subtoken)
-            new_refresh_token = create_refresh_token(subtoken)
+            with span("auth.create_tokens"):
+                access_token = create_token(subtoken)
+                new_refresh_token = create_refresh_token(subtoken)
 
             # Update refresh token in database
             try:
                 success = await KeyTokenQuery.update_refresh_token_and_used_tokens(
                     self.pool,
                     account_info["id"],
+                    refresh_token,
                     new_refresh_token
                 )
-                if not success:
-                    return 500, None, ErrorInternal("Failed to update refresh token")
             except Exception as e:
                 return 500, None, ErrorInternal(f"Error updating refresh token: {str(e)}")
+            if not success:
+                # A concurrent refresh rotated the same token first: treat it as reuse
+                await KeyTokenQuery.delete_key(self.pool, account_info["id"])
+                return 401, None, ErrorNotAuth("Refresh token has been used")
 
             # Prepare output
             output = LoginOutput(
@@ -268,10 +267,9 @@ class AuthService:
 
             # Get user info from Redis cache (assuming it stores enough info for password change)
             try:
-                user_info_str = await global_instance.redis_client.get(subject_uuid)
-                if not user_info_str:
+                user_info = await self._get_session(request)
+                if not user_info:
                     return 500, None, ErrorInternal("User info not found in cache")
-                user_info = json.loads(user_info_str)
             except Exception as e:
                 return 500, None, ErrorInternal(f"Error getting user info from cache: {str(e)}")
 
@@ -283,48 +281,41 @@ class AuthService:
             if err:
                 return 500, None, ErrorInternal(f"Error getting account information from DB: {str(err)}")
 
-            # Verify old password
-            if not Crypto.matching_password(account_data["password"], input_data.old_password, account_data["salt"]):
+            # Verify old password, holding no DB connection meanwhile
+            await release_connection(self.pool)
+            valid, _ = await password_hasher.verify(account_data["password"], input_data.old_password, account_data["salt"])
+            if not valid:
                 return 401, None, ErrorNotAuth("Old password is incorrect")
 
-            # Generate new hashed password and salt
-            new_salt = Crypto.generate_salt()
-            new_hashed_password = Crypto.hash_password(input_data.new_password, new_salt)
+            # New hash embeds its own salt and parameters
+            new_hashed_password = await password_hasher.hash(input_data.new_password)
 
             # Update password in DB
-            success = await AccountQuery.change_password_by_id(self.pool, new_hashed_password, user_info["id"], new_salt)
+            success = await AccountQuery.change_password_by_id(self.pool, new_hashed_password, user_info["id"], "")
             if not success:
                 return 500, None, ErrorInternal("Failed to update password in database")
 
             # Invalidate old tokens by setting a timestamp in Redis (TOKEN_IAT_AVAILABLE_ACCOUNT_ID)
-            invalidation_key = f"TOKEN_IAT_AVAILABLE_{user_info['id']}"
+            invalidation_key = revocation_key(user_info['id'])
             await global_instance.redis_client.set(invalidation_key, int(datetime.utcnow().timestamp()), ex=REFRESH_TOKEN * 3600)
+            await session_cache.publish(subject_uuid, user_info["id"])
 
             # Generate new subtoken and update cache
             subtoken = TokenGenerator.generate_cli_token_uuid(account_data["number"])
             try:
-                # Convert UUID and datetime objects to strings for JSON serialization for new cache entry
-                for key, value in account_data.items():
-                    if isinstance(value, uuid.UUID):
-                        account_data[key] = str(value)
-                    elif isinstance(value, datetime):
-                        account_data[key] = value.isoformat()
-                account_info_json = json.dumps(account_data)
-            except Exception as e:
-                return 500, None, ErrorInternal(f"Error converting account info to JSON for cache: {str(e)}")
-
-            try:
-                await global_instance.redis_client.set(
+                await save_session(
+                    global_instance.redis_client,
                     subtoken,
-                    account_info_json,
-                    ex=REFRESH_TOKEN * 3600  # Convert hours to seconds
+                    account_data,
+                    REFRESH_TOKEN * 3600  # Convert hours to seconds
                 )
             except Exception as e:
                 return 500, None, ErrorInternal(f"Error setting Redis for new subtoken: {str(e)}")
 
             # Create new tokens
-            access_token = create_token(subtoken)
-            new_refresh_token = create_refresh_token(subtoken)
+            with span("auth.create_tokens"):
+                access_token = create_token(subtoken)
+                new_refresh_token = create_refresh_token(subtoken)
 
             # Update refresh token in database
             success = await KeyTokenQuery.update_refresh_token(self.pool, user_info["id"], new_refresh_token)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from api.service.authentication import auth
+from api.service.authentication.auth import AuthService
+from api.sql.account import AccountQuery
+from api.models.login import LoginInput
+from api.utils.crypto import hasher
+from api.utils.crypto.crypto import legacy_digest
+from api.utils.crypto.hasher import PasswordHashPool, identify, verify_password
+
+class AccountTable:
+    """Connection stand-in applying UPGRADE_PASSWORD_HASH to one in-memory row"""
+
+    def __init__(self, password, fail=False):
+        self.row = {"id": "1", "password": password, "salt": "salt"}
+        self.fail = fail
+
+    async def execute(self, sql, account_id, password, salt, old_password):
+        if self.fail:
+            raise ConnectionError("connection lost")
+        if account_id != self.row["id"] or self.row["password"] != old_password:
+            return "UPDATE 0"
+        self.row.update(password=password, salt=salt)
+        return "UPDATE 1"
+
+@pytest.fixture(autouse=True)
+def cheap_hasher(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_ALGORITHM", "scrypt")
+    monkeypatch.setenv("PASSWORD_HASH_SCRYPT_LN", "4")
+    monkeypatch.setattr(hasher, "_hashers", {})
+    pool = PasswordHashPool(workers=1, max_queue=8)
+    monkeypatch.setattr(auth, "password_hasher", pool)
+    yield
+    pool.shutdown()
+
+def rehash(monkeypatch, table, old_hash):
+    async def get_pool():
+        return table
+    monkeypatch.setattr(auth, "get_pool", get_pool)
+    asyncio.run(AuthService(None)._rehash(table.row["id"], old_hash, "secret"))
+
+def test_rehash_replaces_legacy_hash(monkeypatch):
+    old_hash = legacy_digest("secret", "salt")
+    table = AccountTable(old_hash)
+    rehash(monkeypatch, table, old_hash)
+    assert identify(table.row["password"]) == "scrypt"
+    assert table.row["salt"] == ""
+    assert verify_password(table.row["password"], "secret") == (True, False)
+
+def test_rehash_keeps_a_password_changed_meanwhile(monkeypatch):
+    old_hash = legacy_digest("secret", "salt")
+    changed = legacy_digest("new secret", "salt")
+    table = AccountTable(changed)
+    rehash(monkeypatch, table, old_hash)
+    assert table.row["password"] == changed
+
+def test_upgrade_errors_reach_the_caller():
+    table = AccountTable("hash", fail=True)
+    with pytest.raises(ConnectionError):
+        asyncio.run(AccountQuery.upgrade_password_hash(table, "1", "new", "", "hash"))
+
+def test_rehash_errors_are_logged_not_raised(monkeypatch, caplog):
+    table = AccountTable("hash", fail=True)
+    rehash(monkeypatch, table, "hash")
+    assert table.row["password"] == "hash"
+    assert "Could not upgrade password hash" in caplog.text
+
+def test_unknown_username_still_verifies_a_hash(monkeypatch):
+    verified = []
+    pool = auth.password_hasher
+    real_verify = pool.verify
+
+    async def verify(encoded, password, salt=""):
+        verified.append(identify(encoded))
+        return await real_verify(encoded, password, salt)
+
+    async def no_account(executor, username):
+        return None
+
+    monkeypatch.setattr(pool, "verify", verify)
+    monkeypatch.setattr(AccountQuery, "get_account_by_username", no_account)
+    code, output, error = asyncio.run(AuthService(None).login(LoginInput(username="nobody", password="secret")))
+    assert code == 401 and output is None
+    assert verified == ["scrypt"]
@@ -1,13 +1,170 @@
 import asyncpg
-from typing import Optional, List, Dict, Any, Tuple
+from ..initialize.postgres import DBExecutor, acquire_connection
+from ..initialize.statements import statement_registry
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 from datetime import datetime
-from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
 
+logger = logging.getLogger(__name__)
+
+CREATE_ACCOUNT = statement_registry.register("account.create_account", """
+    INSERT INTO account (id, number, code, name, email, username, password, salt, status, images, create_at, created_by, is_deleted, update_at)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+    RETURNING id, number, code, name, email, username, salt, status, images, create_at, created_by, is_deleted, update_at
+""")
+
+COUNT_ACCOUNT_BY_EMAIL = statement_registry.register("account.get_account_by_email", """
+    SELECT COUNT(id) as count
+    FROM account
+    WHERE email = $1 AND is_deleted = false
+""")
+
+HAS_ANY_ACCOUNT = statement_registry.register("account.has_any_account", """
+    SELECT EXISTS (SELECT 1 FROM account)
+""")
+
+GET_ACCOUNT_BY_USERNAME = statement_registry.register("account.get_account_by_username", """
+    SELECT id, number, code, name, email, username, password, salt, status, images, create_at, created_by, is_deleted, update_at
+    FROM account
+    WHERE username = $1 AND is_deleted = false
+""")
+
+GET_ACCOUNT_BY_ID = statement_registry.register("account.get_account_by_id", """
+    SELECT id, number, code, name, email, username, password, salt, status, images, create_at, created_by, is_deleted, update_at
+    FROM account
+    WHERE id = $1 AND is_deleted = false
+""")
+
+CHANGE_PASSWORD_BY_ID = statement_registry.register("account.change_password_by_id", """
+    UPDATE account
+    SET password = $1,
+        salt = $3,
+        update_at = CURRENT_TIMESTAMP
+    WHERE id = $2
+""")
+
+# Rehash on login: only replaces the hash that was verified, so a password
+# changed in the meantime is never overwritten
+UPGRADE_PASSWORD_HASH = statement_registry.register("account.upgrade_password_hash", """
+    UPDATE account
+    SET password = $2,
+        salt = $3
+    WHERE id = $1 AND password = $4
+""")
+
+# Keyset pagination, newest first; served by idx_account_active_create_at_id
+LIST_ACCOUNTS = statement_registry.register("account.list_accounts", """
+    SELECT id, number, code, name, email, username, status, images, create_at, created_by, update_at
+    FROM account
+    WHERE is_deleted = false
+    ORDER BY create_at DESC, id DESC
+    LIMIT $1
+""")
+
+LIST_ACCOUNTS_AFTER = statement_registry.register("account.list_accounts_after", """
+    SELECT id, number, code, name, email, username, status, images, create_at, created_by, update_at
+    FROM account
+    WHERE is_deleted = false AND (create_at, id) < ($1, $2)
+    ORDER BY create_at DESC, id DESC
+    LIMIT $3
+""")
+
+COUNT_ACTIVE_ACCOUNTS = statement_registry.register("account.count_active_accounts", """
+    SELECT COUNT(*) FROM account WHERE is_deleted = false
+""")
+
+# Fuzzy search on the trigram indexes: substring match (ILIKE) or trigram
+# similarity, ranked by the best similarity of name/email/code; the keyset
+# is (score DESC, id)
+SEARCH_ACCOUNTS_SQL = """
+    SELECT id, number, code, name, email, username, status, images, create_at, created_by, update_at, score
+    FROM (
+        SELECT id, number, code, name, email, username, status, images, create_at, created_by, update_at,
+            GREATEST(similarity(name, $1), similarity(email, $1), similarity(code, $1)) AS score
+        FROM account
+        WHERE is_deleted = false
+            AND (name ILIKE $2 OR email ILIKE $2 OR code ILIKE $2
+                 OR name % $1 OR email % $1 OR code % $1)
+    ) matched
+    {after}
+    ORDER BY score DESC, id
+    LIMIT $3
+"""
+
+SEARCH_ACCOUNTS = statement_registry.register(
+    "account.search_accounts",
+    SEARCH_ACCOUNTS_SQL.format(after="")
+)
+
+SEARCH_ACCOUNTS_AFTER = statement_registry.register(
+    "account.search_accounts_after",
+    SEARCH_ACCOUNTS_SQL.format(after="WHERE score < $4 OR (score = $4 AND id > $5)")
+)
+
+EXPORT_ACCOUNTS = """
+    SELECT id, number, code, name, email, username, status, images, create_at, created_by, update_at
+    FROM account
+    WHERE is_deleted = false
+    ORDER BY create_at DESC, id DESC
+"""
+
+# Bulk import runs against a per-transaction temp table, so these are not
+# registered as prepared statements
+CREATE_IMPORT_STAGING = """
+    CREATE TEMP TABLE account_import (
+        line INTEGER NOT NULL,
+        id UUID NOT NULL,
+        number INTEGER NOT NULL,
+        code VARCHAR(255) NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        username VARCHAR(255) NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        salt VARCHAR(255) NOT NULL,
+        status BOOLEAN NOT NULL,
+        images VARCHAR(255) NOT NULL,
+        created_by UUID NOT NULL,
+        create_at TIMESTAMP NOT NULL,
+        update_at TIMESTAMP NOT NULL
+    ) ON COMMIT DROP
+"""
+
+# Rows clashing with an active account or with an earlier line of the same
+# import are reported; ON CONFLICT catches rows inserted concurrently
+MERGE_IMPORT_STAGING = """
+    WITH ranked AS (
+        SELECT s.*,
+            row_number() OVER (PARTITION BY s.username ORDER BY s.line) AS username_rank,
+            row_number() OVER (PARTITION BY s.email ORDER BY s.line) AS email_rank
+        FROM account_import s
+    ), checked AS (
+        SELECT r.*,
+            CASE
+                WHEN EXISTS (SELECT 1 FROM account a WHERE a.username = r.username AND a.is_deleted = false) THEN 'username already exists'
+                WHEN EXISTS (SELECT 1 FROM account a WHERE a.email = r.email AND a.is_deleted = false) THEN 'email already exists'
+                WHEN r.username_rank > 1 THEN 'duplicate username in import'
+                WHEN r.email_rank > 1 THEN 'duplicate email in import'
+            END AS reason
+        FROM ranked r
+    ), inserted AS (
+        INSERT INTO account (id, number, code, name, email, username, password, salt, status, images, create_at, created_by, is_deleted, update_at)
+        SELECT id, number, code, name, email, username, password, salt, status, images, create_at, created_by, false, update_at
+        FROM checked
+        WHERE reason IS NULL
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT c.line, c.username, COALESCE(c.reason, 'account already exists') AS reason
+    FROM checked c
+    LEFT JOIN inserted i ON i.id = c.id
+    WHERE i.id IS NULL
+    ORDER BY c.line
+"""
+
 class AccountQuery:
     @staticmethod
     async def create_account(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         id: str,
         number: int,
         code: str,
@@ -24,48 +181,111 @@ class AccountQuery:
         is_deleted: bool = False,
     ) -> Dict[str, Any]:
         """Create a new account in the database"""
-        query = """
-        INSERT INTO account (id, number, code, name, email, username, password, salt, status, images, create_at, created_by, is_deleted, update_at)
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
-        RETURNING id, number, code, name, email, username, salt, status, images, create_at, created_by, is_deleted, update_at
-        """
-        async with pool.acquire() as conn:
-            record = await conn.fetchrow(query, id, number, code, name, email, username, password,salt,status,images,created_at, created_by, is_deleted, updated_at)
+        async with acquire_connection(pool) as conn:
+            record = await CREATE_ACCOUNT.fetchrow(conn, id, number, code, name, email, username, password,salt,status,images,created_at, created_by, is_deleted, updated_at)
             return dict(record) if record else None
 
+    @staticmethod
+    async def list_accounts(
+        pool: DBExecutor,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """List active accounts after the (create_at, id) keyset position"""
+        async with acquire_connection(pool, readonly=True) as conn:
+            if after is None:
+                records = await LIST_ACCOUNTS.fetch(conn, limit)
+            else:
+                records = await LIST_ACCOUNTS_AFTER.fetch(conn, after[0], after[1], limit)
+            return [dict(record) for record in records]
+
+    @staticmethod
+    async def search_accounts(
+        pool: DBExecutor,
+        query: str,
+        limit: int,
+        after: Optional[Tuple[float, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search active accounts by partial name, email or code, best match first"""
+        # Escape LIKE wildcards so the input is matched literally
+        escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f"%{escaped}%"
+        async with acquire_connection(pool, readonly=True) as conn:
+            if after is None:
+                records = await SEARCH_ACCOUNTS.fetch(conn, query, pattern, limit)
+            else:
+                records = await SEARCH_ACCOUNTS_AFTER.fetch(conn, query, pattern, limit, after[0], after[1])
+            return [dict(record) for record in records]
+
+    @staticmethod
+    async def count_active_accounts(
+        pool: DBExecutor
+    ) -> int:
+        """Exact number of active accounts (full index scan, use sparingly)"""
+        async with acquire_connection(pool, readonly=True) as conn:
+            return await COUNT_ACTIVE_ACCOUNTS.fetchval(conn)
+
+    @staticmethod
+    async def stream_accounts(
+        pool: DBExecutor,
+        prefetch: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate all active accounts through a server-side cursor"""
+        async with acquire_connection(pool, readonly=True) as conn:
+            # Cursors only live inside a transaction
+            async with conn.transaction(readonly=True):
+                async for record in conn.cursor(EXPORT_ACCOUNTS, prefetch=prefetch):
+                    yield dict(record)
+
+    @staticmethod
+    async def import_accounts(
+        pool: DBExecutor,
+        columns: List[str],
+        records: List[tuple]
+    ) -> List[Dict[str, Any]]:
+        """COPY records into a staging table and merge them into account
+
+        Returns the rows that were not inserted with the reason.
+        """
+        async with acquire_connection(pool) as conn:
+            async with conn.transaction():
+                await conn.execute(CREATE_IMPORT_STAGING)
+                await conn.copy_records_to_table('account_import', records=records, columns=columns)
+                rows = await conn.fetch(MERGE_IMPORT_STAGING)
+                return [dict(row) for row in rows]
+
     @staticmethod
     async def get_account_by_email(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         email: str
     ) -> Optional[Dict[str, Any]]:
         """Get account by email"""
-        query = """
-        SELECT COUNT(id) as count
-        FROM account
-        WHERE email = $1 AND is_deleted = false
-        """
-        async with pool.acquire() as conn:
-            record = await conn.fetchrow(query, email)
+        async with acquire_connection(pool, readonly=True) as conn:
+            record = await COUNT_ACCOUNT_BY_EMAIL.fetchrow(conn, email)
             return dict(record) if record else None
 
+    @staticmethod
+    async def has_any_account(
+        pool: DBExecutor
+    ) -> bool:
+        """Check whether at least one account exists (stops at the first row)"""
+        async with acquire_connection(pool, readonly=True) as conn:
+            return await HAS_ANY_ACCOUNT.fetchval(conn)
+
     @staticmethod
     async def get_account_by_username(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         username: str
     ) -> Optional[Dict[str, Any]]:
         """Get account by username"""
-        query = """
-        SELECT id, number, code, name, email, username, password, salt, status, images, create_at, created_by, is_deleted, update_at
-        FROM account
-        WHERE username = $1 AND is_deleted = false
-        """
-        async with pool.acquire() as conn:
-            record = await conn.fetchrow(query, username)
+        # Feeds password checks: always on the primary, a replica may lag behind a password change
+        async with acquire_connection(pool) as conn:
+            record = await GET_ACCOUNT_BY_USERNAME.fetchrow(conn, username)
             return dict(record) if record else None
 
     @staticmethod
     async def get_account_by_id(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         id: str
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
         """Get account by ID
@@ -76,36 +296,46 @@ class AccountQuery:
                 - Second element: Exception if error occurred, None if successful
         """
         try:
-            query = """
-            SELECT id, number, code, name, email, username, password, salt, status, images, create_at, created_by, is_deleted, update_at
-            FROM account
-            WHERE id = $1 AND is_deleted = false
-            """
-            async with pool.acquire() as conn:
-                record = await conn.fetchrow(query, id)
+            # Feeds password checks: always on the primary, a replica may lag behind a password change
+            async with acquire_connection(pool) as conn:
+                record = await GET_ACCOUNT_BY_ID.fetchrow(conn, id)
                 return (dict(record) if record else None, None)
         except Exception as e:
             return None, e
 
     @staticmethod
     async def change_password_by_id(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         password: str,
         account_id: str,
         salt: str
     ) -> bool:
         """Update account password by ID"""
-        query = """
-        UPDATE account
-        SET password = $1,
-            salt = $3,
-            update_at = CURRENT_TIMESTAMP
-        WHERE id = $2
-        """
         try:
-            async with pool.acquire() as conn:
-                await conn.execute(query, password, account_id, salt)
+            async with acquire_connection(pool) as conn:
+                await CHANGE_PASSWORD_BY_ID.execute(conn, password, account_id, salt)
                 return True
         except Exception as e:
             print(f"DEBUG: Error changing password: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    @staticmethod
+    async def upgrade_password_hash(
+        pool: DBExecutor,
+        account_id: str,
+        password: str,
+        salt: str,
+        old_password: str
+    ) -> bool:
+        """Replace an account's password hash with a stronger one of the same password
+
+        Compare-and-swap on the old hash: returns False when the password was
+        changed meanwhile. Errors are raised to the caller.
+        """
+        try:
+            async with acquire_connection(pool) as conn:
+                result = await UPGRADE_PASSWORD_HASH.execute(conn, account_id, password, salt, old_password)
+                return result.endswith(" 1")
+        except Exception as e:
+            logger.debug(f"Error upgrading password hash of account {account_id}: {str(e)}")
+            raise
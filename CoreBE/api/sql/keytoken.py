@@ -1,41 +1,140 @@
 import asyncpg
+from ..initialize.postgres import DBExecutor, acquire_connection
+from ..initialize.statements import statement_registry
 from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
+import hashlib
+import logging
 import uuid
-import json
+from ..const.const import REFRESH_TOKEN
+
+logger = logging.getLogger(__name__)
+
+def token_digest(token: str) -> bytes:
+    """Fixed-size SHA-256 digest used to store and look up refresh tokens"""
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+COUNT_BY_ACCOUNT = statement_registry.register("keytoken.count_by_account", """
+    SELECT COUNT(*) AS total_count
+    FROM keytoken
+    WHERE account_id = $1
+""")
+
+UPDATE_REFRESH_TOKEN = statement_registry.register("keytoken.update_refresh_token", """
+    UPDATE keytoken
+    SET refresh_token_digest = $1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE account_id = $2
+""")
+
+INSERT_KEY = statement_registry.register("keytoken.insert_key", """
+    INSERT INTO keytoken (
+        id,
+        account_id,
+        refresh_token_digest,
+        created_at,
+        updated_at
+    ) VALUES (
+        $1,
+        $2,
+        $3,
+        CURRENT_TIMESTAMP,
+        CURRENT_TIMESTAMP
+    )
+""")
+
+UPSERT_KEY = statement_registry.register("keytoken.upsert_key", """
+    INSERT INTO keytoken (
+        id,
+        account_id,
+        refresh_token_digest,
+        created_at,
+        updated_at
+    ) VALUES (
+        $1,
+        $2,
+        $3,
+        CURRENT_TIMESTAMP,
+        CURRENT_TIMESTAMP
+    )
+    ON CONFLICT (account_id) DO UPDATE
+    SET refresh_token_digest = EXCLUDED.refresh_token_digest,
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+DELETE_KEY = statement_registry.register("keytoken.delete_key", """
+    DELETE FROM keytoken
+    WHERE account_id = $1
+""")
+
+COUNT_REFRESH_TOKEN_BY_ACCOUNT = statement_registry.register("keytoken.count_refresh_token_by_account", """
+    SELECT COUNT(*) AS total_count
+    FROM keytoken
+    WHERE refresh_token_digest = $1
+""")
+
+COUNT_BY_TOKEN_AND_ACCOUNT = statement_registry.register("keytoken.count_by_token_and_account", """
+    SELECT COUNT(*) AS total_count
+    FROM keytoken_used
+    WHERE token_digest = $1
+    AND account_id = $2
+""")
+
+# Single statement: lock the current row if it still holds the presented
+# token, move that digest into keytoken_used (expiring with the refresh TTL)
+# and replace it. A concurrent rotation of the same token finds the row
+# changed once it gets the lock and updates nothing ("UPDATE 0")
+UPDATE_REFRESH_TOKEN_AND_USED_TOKENS = statement_registry.register("keytoken.update_refresh_token_and_used_tokens", """
+    WITH previous AS (
+        SELECT account_id, refresh_token_digest
+        FROM keytoken
+        WHERE account_id = $1 AND refresh_token_digest = $4
+        FOR UPDATE
+    ), used AS (
+        INSERT INTO keytoken_used (token_digest, account_id, expires_at)
+        SELECT refresh_token_digest,
+               account_id,
+               CURRENT_TIMESTAMP + make_interval(hours => $3)
+        FROM previous
+        ON CONFLICT (token_digest) DO NOTHING
+    )
+    UPDATE keytoken
+    SET refresh_token_digest = $2,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE account_id = $1 AND refresh_token_digest = $4
+""")
+
+PRUNE_USED_TOKENS = statement_registry.register("keytoken.prune_used_tokens", """
+    DELETE FROM keytoken_used
+    WHERE token_digest IN (
+        SELECT token_digest
+        FROM keytoken_used
+        WHERE expires_at < CURRENT_TIMESTAMP
+        ORDER BY expires_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+""")
 
 class KeyTokenQuery:
     @staticmethod
     async def count_by_account(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         account_id: str,
     ) -> int:
-        query = """
-        SELECT COUNT(*) AS total_count 
-        FROM keytoken 
-        WHERE account_id = $1
-        """
-        
-        async with pool.acquire() as conn:
-            count = await conn.fetchval(query, account_id)
+        async with acquire_connection(pool, readonly=True) as conn:
+            count = await COUNT_BY_ACCOUNT.fetchval(conn, account_id)
             return count if count is not None else 0
         
     @staticmethod
     async def update_refresh_token(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         account_id: str,
         refresh_token: str
     ) -> bool:
-        query = """
-        UPDATE keytoken
-        SET refresh_token = $1,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE account_id = $2
-        """
-        
         try:
-            async with pool.acquire() as conn:
-                await conn.execute(query, refresh_token, account_id)
+            async with acquire_connection(pool) as conn:
+                await UPDATE_REFRESH_TOKEN.execute(conn, token_digest(refresh_token), account_id)
                 return True
         except Exception as e:
             print(f"DEBUG: Error updating refresh token: {str(e)}")
@@ -43,54 +142,54 @@ class KeyTokenQuery:
 
     @staticmethod
     async def insert_key(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         refresh_token: str,
         account_id: str
     ) -> bool:
-        query = """
-        INSERT INTO keytoken (
-            id,
-            account_id,
-            refresh_token,
-            refresh_tokens_used,
-            created_at,
-            updated_at
-        ) VALUES (
-            $1,
-            $2,
-            $3,
-            '[]'::jsonb,
-            CURRENT_TIMESTAMP,
-            CURRENT_TIMESTAMP
-        )
-        """
-        
         try:
-            async with pool.acquire() as conn:
-                await conn.execute(
-                    query,
+            async with acquire_connection(pool) as conn:
+                await INSERT_KEY.execute(
+                    conn,
                     str(uuid.uuid4()),  # Generate new UUID for id
                     account_id,
-                    refresh_token
+                    token_digest(refresh_token)
                 )
                 return True
         except Exception as e:
             print(f"DEBUG: Error inserting key token: {str(e)}")
             return False
 
+    @staticmethod
+    async def upsert_key(
+        pool: DBExecutor,
+        account_id: str,
+        refresh_token: str
+    ) -> bool:
+        """Insert the account's key token, or replace its refresh token if one exists
+
+        Errors are logged and re-raised so the caller reports the cause.
+        """
+        try:
+            async with acquire_connection(pool) as conn:
+                await UPSERT_KEY.execute(
+                    conn,
+                    str(uuid.uuid4()),
+                    account_id,
+                    token_digest(refresh_token)
+                )
+                return True
+        except Exception:
+            logger.exception(f"Error upserting key token of account {account_id}")
+            raise
+
     @staticmethod
     async def delete_key(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         account_id: str
     ) -> bool:
-        query = """
-        DELETE FROM keytoken
-        WHERE account_id = $1
-        """
-        
         try:
-            async with pool.acquire() as conn:
-                await conn.execute(query, account_id)
+            async with acquire_connection(pool) as conn:
+                await DELETE_KEY.execute(conn, account_id)
                 return True
         except Exception as e:
             print(f"DEBUG: Error deleting key token: {str(e)}")
@@ -98,35 +197,25 @@ class KeyTokenQuery:
 
     @staticmethod
     async def count_refresh_token_by_account(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         refresh_token: str
     ) -> int:
-        query = """
-        SELECT COUNT(*) AS total_count 
-        FROM keytoken 
-        WHERE refresh_token = $1
-        """
-        
-        async with pool.acquire() as conn:
-            count = await conn.fetchval(query, refresh_token)
+        # Token validity check: always on the primary, a replica may lag behind a rotation
+        async with acquire_connection(pool) as conn:
+            count = await COUNT_REFRESH_TOKEN_BY_ACCOUNT.fetchval(conn, token_digest(refresh_token))
             return count if count is not None else 0
 
     @staticmethod
     async def count_by_token_and_account(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         account_id: str,
         refresh_token: str
     ) -> int:
-        query = """
-        SELECT COUNT(*) AS total_count 
-        FROM keytoken 
-        WHERE account_id = $1 
-        AND refresh_tokens_used::jsonb @> $2::jsonb
-        """
-        
+        """Count matches of a refresh token among the account's already used tokens"""
         try:
-            async with pool.acquire() as conn:
-                count = await conn.fetchval(query, account_id, json.dumps([refresh_token]))
+            # Reuse detection: always on the primary, a replica may miss the latest rotation
+            async with acquire_connection(pool) as conn:
+                count = await COUNT_BY_TOKEN_AND_ACCOUNT.fetchval(conn, token_digest(refresh_token), account_id)
                 return count if count is not None else 0
         except Exception as e:
             print(f"DEBUG: Error counting by token and account: {str(e)}")
@@ -134,37 +223,38 @@ class KeyTokenQuery:
 
     @staticmethod
     async def update_refresh_token_and_used_tokens(
-        pool: asyncpg.Pool,
+        pool: DBExecutor,
         account_id: str,
+        old_refresh_token: str,
         refresh_token: str
     ) -> bool:
-        query = """
-        UPDATE keytoken
-        SET refresh_token = $1,
-            refresh_tokens_used = refresh_tokens_used || $2::jsonb,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE account_id = $3
+        """Rotate the refresh token, recording the previous one as used
+
+        Returns False when the account no longer holds `old_refresh_token`,
+        i.e. it was already rotated (token reuse). Errors are logged and
+        re-raised.
         """
-        
         try:
-            async with pool.acquire() as conn:
-                # Get current refresh token before updating
-                current_token_query = """
-                SELECT refresh_token 
-                FROM keytoken 
-                WHERE account_id = $1
-                """
-                current_token = await conn.fetchval(current_token_query, account_id)
-                
-                if current_token:
-                    # Add current token to used tokens list
-                    used_tokens = json.dumps([current_token])
-                    await conn.execute(query, refresh_token, used_tokens, account_id)
-                else:
-                    # If no current token, just update the refresh token
-                    await conn.execute(query, refresh_token, json.dumps([]), account_id)
-                return True
-        except Exception as e:
-            print(f"DEBUG: Error updating refresh token and used tokens: {str(e)}")
-            return False
-    
\ No newline at end of file
+            async with acquire_connection(pool) as conn:
+                result = await UPDATE_REFRESH_TOKEN_AND_USED_TOKENS.execute(
+                    conn,
+                    account_id,
+                    token_digest(refresh_token),
+                    REFRESH_TOKEN,
+                    token_digest(old_refresh_token)
+                )
+                return result.endswith(" 1")
+        except Exception:
+            logger.exception(f"Error rotating refresh token of account {account_id}")
+            raise
+
+    @staticmethod
+    async def prune_used_tokens(
+        pool: DBExecutor,
+        batch_size: int = 1000
+    ) -> int:
+        """Delete one batch of expired used tokens, returning how many were removed"""
+        async with acquire_connection(pool) as conn:
+            result = await PRUNE_USED_TOKENS.execute(conn, batch_size)
+            # Status string looks like "DELETE <count>"
+            return int(result.split()[-1])
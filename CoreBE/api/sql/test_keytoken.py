@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from api.sql.keytoken import KeyTokenQuery, token_digest
+
+class KeyTokenTable:
+    """Connection stand-in applying the rotation statement to one in-memory row"""
+
+    def __init__(self, refresh_token):
+        self.row = {"account_id": "1", "refresh_token_digest": token_digest(refresh_token)}
+        self.used = []
+
+    async def execute(self, sql, account_id, new_digest, hours, old_digest):
+        if self.row["account_id"] != account_id or self.row["refresh_token_digest"] != old_digest:
+            return "UPDATE 0"
+        self.used.append(old_digest)
+        self.row["refresh_token_digest"] = new_digest
+        return "UPDATE 1"
+
+def rotate(table, old, new):
+    return asyncio.run(KeyTokenQuery.update_refresh_token_and_used_tokens(table, "1", old, new))
+
+def test_rotation_replaces_the_presented_token():
+    table = KeyTokenTable("old")
+    assert rotate(table, "old", "new")
+    assert table.row["refresh_token_digest"] == token_digest("new")
+    assert table.used == [token_digest("old")]
+
+def test_second_rotation_of_the_same_token_is_reuse():
+    table = KeyTokenTable("old")
+    assert rotate(table, "old", "first")
+    assert not rotate(table, "old", "second")
+    assert table.row["refresh_token_digest"] == token_digest("first")
+
+def test_rotation_errors_reach_the_caller():
+    class Broken:
+        async def execute(self, *args):
+            raise ConnectionError("connection lost")
+
+    with pytest.raises(ConnectionError):
+        rotate(Broken(), "old", "new")
@@ -1,7 +1,10 @@
 import jwt
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from typing import Optional, Tuple, Dict, Any
-from api.initialize.redis import RedisInitializer
+from api.global_config.global_val import global_instance
+from api.utils.auth.session import session_key, decode_session, decode_legacy_session, migrate_legacy_session
+from api.utils.auth.session_cache import session_cache
 import logging
 import uuid
 import os
@@ -9,9 +12,6 @@ from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
-# Initialize Redis
-redis_init = RedisInitializer()
-
 class TokenClaims:
     def __init__(self, claims: Dict[str, Any]):
         self.exp = claims.get('exp')
@@ -26,33 +26,132 @@ class TokenResponse(BaseModel):
     expires_at: datetime
     token_type: str
 
-async def check_blacklist(token: str) -> bool:
+# Resolves everything the auth dependency needs in one round trip:
+# KEYS[1] token blacklist, KEYS[2] subject blacklist, KEYS[3] session hash,
+# KEYS[4] USER_INFO_ entry (account id), KEYS[5] legacy JSON session and,
+# once the subject's account id is known, KEYS[6] its TOKEN_IAT_AVAILABLE_
+# revocation key. Every key read is declared, as Redis Cluster requires.
+TOKEN_STATE_SCRIPT = """
+local blacklisted = redis.call('EXISTS', KEYS[1], KEYS[2])
+local session = redis.call('HGETALL', KEYS[3])
+local legacy = false
+local legacy_ttl = -2
+local account_id = redis.call('GET', KEYS[4])
+if #session > 0 then
+    if not account_id then
+        for i = 1, #session, 2 do
+            if session[i] == 'i' then
+                account_id = session[i + 1]
+            end
+        end
+    end
+else
+    legacy = redis.call('GET', KEYS[5])
+    if legacy then
+        legacy_ttl = redis.call('PTTL', KEYS[5])
+        if not account_id then
+            local ok, decoded = pcall(cjson.decode, legacy)
+            if ok and type(decoded) == 'table' and decoded['id'] then
+                account_id = tostring(decoded['id'])
+            end
+        end
+    end
+end
+local revoked_before = false
+if KEYS[6] then
+    revoked_before = redis.call('GET', KEYS[6])
+end
+return {blacklisted, session, legacy, legacy_ttl, revoked_before, account_id}
+"""
+
+_token_state_script = None
+
+# Subject -> account id, learnt from the script's answer. A subject belongs to
+# one account for its whole life, so the revocation key can be passed in KEYS
+# from the second request on; the first costs one extra GET.
+MAX_SUBJECT_ACCOUNTS = 10000
+_subject_accounts: "OrderedDict[str, str]" = OrderedDict()
+
+def revocation_key(account_id: str) -> str:
+    return f"TOKEN_IAT_AVAILABLE_{account_id}"
+
+def _remember_account(subject: str, account_id: str):
+    _subject_accounts[subject] = account_id
+    _subject_accounts.move_to_end(subject)
+    while len(_subject_accounts) > MAX_SUBJECT_ACCOUNTS:
+        _subject_accounts.popitem(last=False)
+
+class TokenState:
+    def __init__(self, blacklisted: bool, session: Optional[Dict[str, Any]], revoked: bool):
+        self.blacklisted = blacklisted
+        self.session = session
+        self.revoked = revoked
+
+def _get_token_state_script():
+    global _token_state_script
+    client = global_instance.redis_client
+    if _token_state_script is None or _token_state_script.registered_client is not client:
+        _token_state_script = client.register_script(TOKEN_STATE_SCRIPT)
+    return _token_state_script
+
+async def check_token_state(token: str, claims: TokenClaims) -> Tuple[Optional[TokenState], Optional[Exception]]:
+    """Blacklist, session and password-change revocation of a token in one Redis call"""
     try:
-        if not redis_init.client:
-            await redis_init.initialize()
-            
-        # Create Redis key in correct format
-        redis_key = f"TOKEN_BLACK_LIST_{token}"
-        
-        # Check if key exists in Redis
-        result = await redis_init.client.get(redis_key)
-        
-        # If result exists, token is blacklisted
-        if result is not None:
-            return True
-            
-        return False
-        
+        if not global_instance.redis_client:
+            return None, Exception("Redis client not initialized")
+
+        # Hot tokens already validated recently skip Redis entirely
+        cached = session_cache.get(token)
+        if cached is not None:
+            return cached, None
+        generation = session_cache.generation
+
+        script = _get_token_state_script()
+        keys = [
+            f"TOKEN_BLACK_LIST_{token}",
+            f"TOKEN_BLACK_LIST_{claims.sub}",
+            session_key(claims.sub),
+            f"USER_INFO_{claims.sub}",
+            claims.sub,
+        ]
+        known_account = _subject_accounts.get(claims.sub)
+        if known_account is not None:
+            keys.append(revocation_key(known_account))
+        blacklisted, session_data, legacy, legacy_ttl, revoked_before, account_id = await script(keys=keys)
+        if account_id is not None and str(account_id) != known_account:
+            account_id = str(account_id)
+            revoked_before = await global_instance.redis_client.get(revocation_key(account_id))
+            _remember_account(claims.sub, account_id)
+
+        if session_data:
+            session = decode_session(session_data)
+        elif legacy:
+            # Sessions written before the compact format are converted on first use
+            session = decode_legacy_session(legacy)
+            if session is not None:
+                await migrate_legacy_session(global_instance.redis_client, claims.sub, session, legacy_ttl)
+        else:
+            session = None
+
+        revoked = False
+        if revoked_before:
+            try:
+                revoked = claims.iat is None or int(claims.iat) < int(revoked_before)
+            except ValueError as e:
+                logger.error(f"Error parsing timestamp from Redis: {e}")
+                return None, Exception(f"Error parsing timestamp from Redis: {e}")
+
+        state = TokenState(bool(blacklisted), session, revoked)
+        if not state.blacklisted and not state.revoked and state.session is not None:
+            session_cache.set(token, state, (claims.sub, str(account_id or "")), generation)
+        return state, None
+
     except Exception as e:
-        logger.error(f"Error checking Redis blacklist: {e}")
-        return False
+        logger.error(f"Error checking token state: {e}")
+        return None, e
 
 async def verify_token_subject(token: str) -> Tuple[Optional[TokenClaims], Optional[Exception]]:
     try:
-        # Check blacklist first
-        if await check_blacklist(token):
-            return None, Exception("token is blacklisted")
-            
         # Parse the token
         claims = jwt.decode(token, options={"verify_signature": False})
         
@@ -60,6 +159,9 @@ async def verify_token_subject(token: str) -> Tuple[Optional[TokenClaims], Optio
         token_claims = TokenClaims(claims)
         
         # Validate claims
+        if not token_claims.sub:
+            return None, Exception("token has no subject")
+
         if token_claims.exp and datetime.utcnow().timestamp() > token_claims.exp:
             return None, Exception("token has expired")
             
@@ -73,47 +175,6 @@ async def verify_token_subject(token: str) -> Tuple[Optional[TokenClaims], Optio
     except Exception as e:
         return None, e
 
-async def check_token_revoked(subtoken: str, issued_at: int) -> Tuple[bool, Optional[Exception]]:
-    try:
-        if not redis_init.client:
-            await redis_init.initialize()
-            
-        # Get user info from cache
-        user_info_key = f"USER_INFO_{subtoken}"
-        user_info = await redis_init.client.get(user_info_key)
-        
-        if not user_info:
-            logger.info("No user info found in cache, assuming token not revoked")
-            return False, None
-            
-        # Create Redis key for password change timestamp
-        invalidation_key = f"TOKEN_IAT_AVAILABLE_{user_info.decode()}"
-        
-        # Get password change timestamp from Redis
-        change_password_timestamp = await redis_init.client.get(invalidation_key)
-        
-        if not change_password_timestamp:
-            logger.info("No password change timestamp found, token not revoked")
-            return False, None
-            
-        # Convert timestamp to int
-        try:
-            change_password_timestamp = int(change_password_timestamp.decode())
-        except ValueError as e:
-            logger.error(f"Error parsing timestamp from Redis: {e}")
-            return False, Exception(f"Error parsing timestamp from Redis: {e}")
-            
-        # Check if token is revoked due to password change
-        if issued_at < change_password_timestamp:
-            logger.info("Token revoked due to password change")
-            return True, None
-            
-        return False, None
-        
-    except Exception as e:
-        logger.error(f"Error checking token revocation: {e}")
-        return False, e
-
 def create_token(uuid_token: str) -> str:
     # 1. Set time expiration
     time_ex = os.getenv("ACCESS_TOKEN", "72h")
@@ -0,0 +1,90 @@
+import base64
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Sessions are Redis hashes under "s:<digest>" holding only what the API
+# reads back, with one-letter field names. The digest is the first 16 bytes
+# of SHA-256 of the subject in base64url (22 chars), much shorter than the
+# "<number>clitoken<uuid>" subject. Version 0 is the legacy full account
+# row stored as JSON under the bare subject key.
+SESSION_VERSION = 1
+SESSION_KEY_PREFIX = "s:"
+
+# session field -> hash field
+SESSION_FIELDS = {
+    "id": "i",
+    "username": "u",
+    "email": "e",
+    "number": "n",
+}
+_FIELD_NAMES = {short: name for name, short in SESSION_FIELDS.items()}
+
+def session_key(subject: str) -> str:
+    digest = hashlib.sha256(subject.encode('utf-8')).digest()[:16]
+    return SESSION_KEY_PREFIX + base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+def encode_session(account: Mapping[str, Any]) -> Dict[str, str]:
+    """Compact hash mapping of an account row (or decoded session)"""
+    data = {"v": str(SESSION_VERSION)}
+    for name, short in SESSION_FIELDS.items():
+        value = account.get(name)
+        if value is not None:
+            data[short] = str(value)
+    return data
+
+def decode_session(data: Union[Mapping[str, str], List[str]]) -> Optional[Dict[str, Any]]:
+    """Decode a session hash, as a mapping or as a flat HGETALL reply from Lua"""
+    if isinstance(data, list):
+        data = dict(zip(data[::2], data[1::2]))
+    if not data:
+        return None
+    if data.get("v") != str(SESSION_VERSION):
+        logger.warning(f"Unknown session version: {data.get('v')}")
+        return None
+    session = {_FIELD_NAMES[short]: value for short, value in data.items() if short in _FIELD_NAMES}
+    if "number" in session:
+        session["number"] = int(session["number"])
+    return session
+
+def decode_legacy_session(raw: str) -> Optional[Dict[str, Any]]:
+    """Read a version 0 (JSON account row) session, keeping only the session fields"""
+    account = json.loads(raw)
+    if not isinstance(account, dict):
+        return None
+    return {name: account[name] for name in SESSION_FIELDS if account.get(name) is not None}
+
+async def save_session(client, subject: str, account: Mapping[str, Any], ttl: int):
+    """Store a session for `ttl` seconds"""
+    key = session_key(subject)
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=encode_session(account))
+        pipe.expire(key, ttl)
+        await pipe.execute()
+
+async def migrate_legacy_session(client, subject: str, session: Mapping[str, Any], ttl_ms: int):
+    """Rewrite a legacy JSON session in the compact format, keeping its remaining TTL"""
+    if ttl_ms <= 0:
+        return
+    key = session_key(subject)
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=encode_session(session))
+        pipe.pexpire(key, ttl_ms)
+        pipe.delete(subject)
+        await pipe.execute()
+
+async def load_session(client, subject: str) -> Optional[Dict[str, Any]]:
+    """Read a session, migrating it when it is still in the legacy format"""
+    data = await client.hgetall(session_key(subject))
+    if data:
+        return decode_session(data)
+    raw = await client.get(subject)
+    if not raw:
+        return None
+    session = decode_legacy_session(raw)
+    if session is not None:
+        await migrate_legacy_session(client, subject, session, await client.pttl(subject))
+    return session
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_INVALIDATE_CHANNEL = "SESSION_INVALIDATE"
+
+class SessionCache:
+    """Bounded in-process LRU/TTL cache of token state
+
+    Entries are tagged (subject, account id) and dropped on every worker when
+    an invalidation for one of their tags is published on the Redis channel.
+    The cache is bypassed while the subscription is down, since invalidations
+    could be missed, and the TTL bounds staleness if a message is lost.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30.0, channel: str = SESSION_INVALIDATE_CHANNEL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.channel = channel
+        self.connected = False
+        self.generation = 0  # bumped on every invalidation, see set()
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._client = None
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.connected:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, tags: Tuple[str, ...], generation: int):
+        """Store a value read from Redis when no invalidation happened since `generation`"""
+        if not self.connected or generation != self.generation:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *tags: str):
+        self.generation += 1
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._remove(key)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def publish(self, *tags: str):
+        """Invalidate locally and on every other worker"""
+        tags = tuple(str(tag) for tag in tags if tag)
+        self.invalidate(*tags)
+        if self._client is None:
+            return
+        try:
+            await self._client.publish(self.channel, json.dumps(tags))
+        except Exception as e:
+            logger.error(f"Error publishing session invalidation: {str(e)}")
+
+    def start(self, client):
+        """Subscribe to the invalidation channel in the background"""
+        self._client = client
+        self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        # Anything cached before (re)subscribing may have missed invalidations
+                        self.clear()
+                        self.connected = True
+                    elif message["type"] == "message":
+                        self.invalidate(*json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Session invalidation subscription lost: {str(e)}")
+            finally:
+                self.connected = False
+                self.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(1)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._client = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# Global session cache
+session_cache = SessionCache(
+    max_size=int(os.getenv('SESSION_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('SESSION_CACHE_TTL', 30))
+)
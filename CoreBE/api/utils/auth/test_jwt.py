@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from api.global_config.global_val import global_instance
+from api.utils.auth import jwt
+from api.utils.auth.jwt import TokenClaims, check_token_state, revocation_key
+
+class FakeRedis:
+    """Plain key/value store plus a TOKEN_STATE_SCRIPT stand-in that only reads its KEYS"""
+
+    def __init__(self, values):
+        self.values = values
+        self.script_keys = []
+        self.gets = []
+
+    async def get(self, key):
+        self.gets.append(key)
+        return self.values.get(key)
+
+    async def script(self, keys):
+        self.script_keys.append(keys)
+        revoked_before = self.values.get(keys[5]) if len(keys) > 5 else False
+        return [0, [], False, -2, revoked_before, self.values.get(keys[3])]
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = FakeRedis({"USER_INFO_sub": "42", revocation_key("42"): "2000"})
+    monkeypatch.setattr(global_instance, "redis_client", client, raising=False)
+    monkeypatch.setattr(jwt, "_get_token_state_script", lambda: client.script)
+    monkeypatch.setattr(jwt, "_subject_accounts", jwt.OrderedDict())
+    return client
+
+def test_revocation_key_is_declared_once_the_account_is_known(redis):
+    claims = TokenClaims({"sub": "sub", "iat": 1000})
+    first, _ = asyncio.run(check_token_state("token", claims))
+    second, _ = asyncio.run(check_token_state("token", claims))
+    assert first.revoked and second.revoked
+    # The first request learns the account id and reads the key itself ...
+    assert len(redis.script_keys[0]) == 5
+    assert redis.gets == [revocation_key("42")]
+    # ... later ones pass it to the script in KEYS
+    assert redis.script_keys[1][5] == revocation_key("42")
+    assert len(redis.gets) == 1
+
+def test_tokens_issued_after_revocation_are_valid(redis):
+    state, error = asyncio.run(check_token_state("token", TokenClaims({"sub": "sub", "iat": 3000})))
+    assert error is None and not state.revoked
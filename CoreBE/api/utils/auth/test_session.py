@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+from api.utils.auth.session import (
+    decode_legacy_session, decode_session, encode_session, load_session, session_key
+)
+
+SUBJECT = "1234clitoken6f1c2a8e-3f4b-4d7a-9c1e-2b5d8a7f0e91"
+ACCOUNT = {
+    "id": "6f1c2a8e-0000-4d7a-9c1e-2b5d8a7f0e91",
+    "username": "admin",
+    "email": "admin@example.com",
+    "number": 1234,
+    "password": "$scrypt$...",
+    "images": None,
+}
+SESSION = {key: ACCOUNT[key] for key in ("id", "username", "email", "number")}
+
+def test_session_key_is_short_and_stable():
+    key = session_key(SUBJECT)
+    assert key == session_key(SUBJECT)
+    assert key != session_key(SUBJECT + "x")
+    assert len(key) == 24 < len(SUBJECT)
+
+def test_encode_decode_round_trip():
+    encoded = encode_session(ACCOUNT)
+    assert "$scrypt$..." not in encoded.values()
+    assert decode_session(encoded) == SESSION
+
+def test_decode_flat_lua_reply():
+    flat = [item for pair in encode_session(ACCOUNT).items() for item in pair]
+    assert decode_session(flat) == SESSION
+
+def test_unknown_version_is_ignored():
+    assert decode_session({**encode_session(ACCOUNT), "v": "9"}) is None
+    assert decode_session({}) is None
+
+def test_legacy_json_session_keeps_session_fields():
+    raw = json.dumps({**ACCOUNT, "create_at": "2024-01-01T00:00:00"})
+    assert decode_legacy_session(raw) == SESSION
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def hset(self, key, mapping):
+        self.client.hashes[key] = dict(mapping)
+
+    def pexpire(self, key, ttl_ms):
+        self.client.ttls[key] = ttl_ms
+
+    def delete(self, key):
+        self.client.strings.pop(key, None)
+
+    async def execute(self):
+        pass
+
+class FakeRedis:
+    def __init__(self, strings):
+        self.strings = strings
+        self.hashes = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def hgetall(self, key):
+        return self.hashes.get(key, {})
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def pttl(self, key):
+        return 60000 if key in self.strings else -2
+
+def test_legacy_session_is_migrated_on_read():
+    client = FakeRedis({SUBJECT: json.dumps(ACCOUNT)})
+    assert asyncio.run(load_session(client, SUBJECT)) == SESSION
+    assert SUBJECT not in client.strings
+    assert client.ttls == {session_key(SUBJECT): 60000}
+    # The next read finds the compact session
+    assert asyncio.run(load_session(client, SUBJECT)) == SESSION
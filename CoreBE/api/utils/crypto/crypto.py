@@ -1,13 +1,23 @@
 import hashlib
 import os
+import time
 from dotenv import load_dotenv
+from ..metrics.metrics import password_hash_duration
+from ...initialize.tracing import span
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Get SECRET_KEY from environment variables
 SECRET_KEY = os.getenv('SECRET_KEY')
+
+def legacy_digest(password: str, salt: str) -> str:
+    """SHA-256 of password + salt + SECRET_KEY, the format of legacy stored hashes"""
+    return hashlib.sha256(f"{password}{salt}{SECRET_KEY}".encode('utf-8')).hexdigest()
+
 class Crypto:
+    """Legacy SHA-256 scheme; new hashes come from hasher.password_hasher"""
+
     @staticmethod
     def generate_salt(length: int = 16) -> str:
         """Generate a random salt."""
@@ -15,11 +25,11 @@ class Crypto:
 
     @staticmethod
     def hash_password(password: str, salt: str) -> str:
-        # Combine password, salt and secret key
-        salted_password = f"{password}{salt}{SECRET_KEY}"
-        # Create SHA256 hash
-        hash_obj = hashlib.sha256(salted_password.encode('utf-8'))
-        return hash_obj.hexdigest()
+        started = time.perf_counter()
+        with span("crypto.hash_password"):
+            digest = legacy_digest(password, salt)
+        password_hash_duration.observe(time.perf_counter() - started, ("sha256",))
+        return digest
 
     @staticmethod
     def matching_password(store_hash: str, password: str, salt: str) -> bool:
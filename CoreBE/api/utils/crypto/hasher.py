@@ -0,0 +1,265 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from .crypto import legacy_digest
+from ..metrics.metrics import metrics, password_hash_duration
+from ...initialize.server import available_cpus
+from ...initialize.tracing import span
+from ...response.errors import ErrorServiceUnavailable
+
+logger = logging.getLogger(__name__)
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+def _parse_params(params: str) -> Dict[str, int]:
+    return {key: int(value) for key, value in (item.split('=', 1) for item in params.split(','))}
+
+class ScryptHasher:
+    """scrypt from hashlib: `$scrypt$ln=15,r=8,p=1$<salt>$<hash>`"""
+
+    name = "scrypt"
+
+    def __init__(self, ln: int = 15, r: int = 8, p: int = 1):
+        self.ln = ln
+        self.r = r
+        self.p = p
+
+    def _derive(self, password: str, salt: bytes, ln: int, r: int, p: int) -> bytes:
+        n = 1 << ln
+        # hashlib refuses anything above maxmem, 32 MiB by default
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=32)
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.ln, self.r, self.p)
+        return f"$scrypt$ln={self.ln},r={self.r},p={self.p}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, encoded: str, password: str) -> bool:
+        _, _, params, salt, digest = encoded.split('$')
+        params = _parse_params(params)
+        expected = _b64decode(digest)
+        actual = self._derive(password, _b64decode(salt), params['ln'], params['r'], params['p'])
+        return hmac.compare_digest(actual, expected)
+
+    def needs_update(self, encoded: str) -> bool:
+        return _parse_params(encoded.split('$')[2]) != {"ln": self.ln, "r": self.r, "p": self.p}
+
+class Pbkdf2Hasher:
+    """PBKDF2-HMAC-SHA256 from hashlib: `$pbkdf2-sha256$i=600000$<salt>$<hash>`"""
+
+    name = "pbkdf2-sha256"
+
+    def __init__(self, iterations: int = 600000):
+        self.iterations = iterations
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, self.iterations)
+        return f"$pbkdf2-sha256$i={self.iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, encoded: str, password: str) -> bool:
+        _, _, params, salt, digest = encoded.split('$')
+        iterations = _parse_params(params)['i']
+        actual = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), _b64decode(salt), iterations)
+        return hmac.compare_digest(actual, _b64decode(digest))
+
+    def needs_update(self, encoded: str) -> bool:
+        return _parse_params(encoded.split('$')[2])['i'] != self.iterations
+
+class Argon2Hasher:
+    """argon2id through argon2-cffi (optional dependency), in its own PHC format"""
+
+    name = "argon2id"
+
+    def __init__(self, memory_cost: int = 19456, time_cost: int = 2, parallelism: int = 1):
+        from argon2 import PasswordHasher
+        self._hasher = PasswordHasher(memory_cost=memory_cost, time_cost=time_cost, parallelism=parallelism)
+
+    def hash(self, password: str) -> str:
+        return self._hasher.hash(password)
+
+    def verify(self, encoded: str, password: str) -> bool:
+        from argon2.exceptions import VerificationError, InvalidHashError
+        try:
+            return self._hasher.verify(encoded, password)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    def needs_update(self, encoded: str) -> bool:
+        return self._hasher.check_needs_rehash(encoded)
+
+# Hashes written before this module: hex SHA-256 of password + salt column + SECRET_KEY
+LEGACY_ALGORITHM = "sha256"
+
+def identify(encoded: str) -> str:
+    """Algorithm of a stored hash, from its `$<id>$` prefix"""
+    if not encoded.startswith('$'):
+        return LEGACY_ALGORITHM
+    algorithm = encoded.split('$', 2)[1]
+    return "argon2id" if algorithm.startswith("argon2") else algorithm
+
+def _build_hasher(algorithm: str):
+    if algorithm == "scrypt":
+        return ScryptHasher(ln=int(os.getenv('PASSWORD_HASH_SCRYPT_LN', 15)),
+                            r=int(os.getenv('PASSWORD_HASH_SCRYPT_R', 8)),
+                            p=int(os.getenv('PASSWORD_HASH_SCRYPT_P', 1)))
+    if algorithm == "pbkdf2-sha256":
+        return Pbkdf2Hasher(iterations=int(os.getenv('PASSWORD_HASH_PBKDF2_ITERATIONS', 600000)))
+    if algorithm == "argon2id":
+        return Argon2Hasher(memory_cost=int(os.getenv('PASSWORD_HASH_ARGON2_MEMORY_KIB', 19456)),
+                            time_cost=int(os.getenv('PASSWORD_HASH_ARGON2_TIME_COST', 2)),
+                            parallelism=int(os.getenv('PASSWORD_HASH_ARGON2_PARALLELISM', 1)))
+    raise ValueError(f"Unsupported password hash algorithm: {algorithm}")
+
+_hashers: Dict[str, object] = {}
+
+def get_hasher(algorithm: str):
+    """Hasher for an algorithm, built once per process from the environment"""
+    hasher = _hashers.get(algorithm)
+    if hasher is None:
+        hasher = _hashers[algorithm] = _build_hasher(algorithm)
+    return hasher
+
+def default_algorithm() -> str:
+    return os.getenv('PASSWORD_HASH_ALGORITHM', 'scrypt')
+
+def hash_password(password: str, algorithm: Optional[str] = None) -> str:
+    """Encoded hash of a new password; blocking, for executors and worker processes"""
+    return get_hasher(algorithm or default_algorithm()).hash(password)
+
+def verify_password(encoded: str, password: str, salt: str = "") -> Tuple[bool, bool]:
+    """Check a password against its stored hash; blocking
+
+    Returns (valid, needs_rehash). Legacy SHA-256 hashes, and hashes made
+    with another algorithm or older parameters, need a rehash.
+    """
+    algorithm = identify(encoded)
+    if algorithm == LEGACY_ALGORITHM:
+        valid = hmac.compare_digest(encoded, legacy_digest(password, salt))
+        return valid, valid
+    valid = get_hasher(algorithm).verify(encoded, password)
+    preferred = default_algorithm()
+    needs_rehash = valid and (algorithm != preferred or get_hasher(algorithm).needs_update(encoded))
+    return valid, needs_rehash
+
+password_hash_in_flight = metrics.gauge(
+    "password_hash_in_flight", "Password hashes running in the hashing pool")
+password_hash_queue_depth = metrics.gauge(
+    "password_hash_queue_depth", "Password hashes waiting for a hashing pool slot")
+password_hash_wait = metrics.histogram(
+    "password_hash_wait_seconds", "Time spent waiting for a hashing pool slot")
+password_hash_rejected = metrics.counter(
+    "password_hash_rejected_total", "Password hashes rejected because the queue was full")
+
+class PasswordHashPool:
+    """Runs password hashing off the event loop, with bounded concurrency
+
+    At most `workers` hashes run at once (hashlib and argon2 release the
+    GIL, so threads scale across cores; a process pool is available too).
+    Up to `max_queue` more wait for a slot; beyond that requests fail
+    fast with 503 instead of piling up behind a CPU-bound queue.
+    """
+
+    def __init__(self, workers: int, max_queue: int, kind: str = "thread"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self.running = 0
+        self.waiting = 0
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._dummy_hashes: Dict[str, str] = {}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, algorithm: str, func, *args):
+        if self.waiting >= self.max_queue and self.running >= self.workers:
+            password_hash_rejected.inc()
+            raise ErrorServiceUnavailable("Too many concurrent logins, try again later")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        password_hash_queue_depth.inc()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            password_hash_queue_depth.dec()
+        started = time.perf_counter()
+        password_hash_wait.observe(started - queued)
+
+        self.running += 1
+        password_hash_in_flight.inc()
+        try:
+            with span("crypto.password_hash", algorithm=algorithm):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.running -= 1
+            password_hash_in_flight.dec()
+            self._semaphore.release()
+            password_hash_duration.observe(time.perf_counter() - started, (algorithm,))
+
+    async def hash(self, password: str) -> str:
+        algorithm = default_algorithm()
+        return await self._run(algorithm, hash_password, password, algorithm)
+
+    async def verify(self, encoded: str, password: str, salt: str = "") -> Tuple[bool, bool]:
+        algorithm = identify(encoded)
+        if algorithm == LEGACY_ALGORITHM:
+            # A single SHA-256 takes microseconds; pay for a full-cost verify of
+            # the dummy hash as well, so legacy accounts answer as slowly as
+            # unknown usernames and other accounts
+            result = verify_password(encoded, password, salt)
+            await self._run(default_algorithm(), verify_password, await self.dummy_hash(), password)
+            return result
+        return await self._run(algorithm, verify_password, encoded, password, salt)
+
+    async def dummy_hash(self) -> str:
+        """Hash of a random password, made once per algorithm
+
+        Logins for unknown usernames and legacy hashes verify against it, so
+        they cost as much as any other login and the response time does not
+        reveal which usernames exist.
+        """
+        algorithm = default_algorithm()
+        encoded = self._dummy_hashes.get(algorithm)
+        if encoded is None:
+            encoded = self._dummy_hashes[algorithm] = await self.hash(os.urandom(16).hex())
+        return encoded
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+def default_workers() -> int:
+    """The CPUs split between the server workers (SERVER_WORKER_COUNT, set by serve())"""
+    return max(1, available_cpus() // int(os.getenv('SERVER_WORKER_COUNT') or 1))
+
+# Global password hashing pool
+password_hasher = PasswordHashPool(
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS') or default_workers()),
+    max_queue=int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 64)),
+    kind=os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')
+)
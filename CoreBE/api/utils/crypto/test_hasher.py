@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+
+from api.response.errors import ErrorServiceUnavailable
+from api.utils.crypto import hasher
+from api.utils.crypto.crypto import legacy_digest
+from api.utils.crypto.hasher import PasswordHashPool, hash_password, identify, verify_password
+
+ALGORITHMS = ["scrypt", "pbkdf2-sha256", "argon2id"]
+
+@pytest.fixture(autouse=True)
+def cheap_hashers(monkeypatch):
+    # Low costs keep the suite fast; the formats and code paths are the same
+    monkeypatch.setenv("PASSWORD_HASH_ALGORITHM", "scrypt")
+    monkeypatch.setenv("PASSWORD_HASH_SCRYPT_LN", "4")
+    monkeypatch.setenv("PASSWORD_HASH_PBKDF2_ITERATIONS", "1000")
+    monkeypatch.setenv("PASSWORD_HASH_ARGON2_MEMORY_KIB", "1024")
+    monkeypatch.setenv("PASSWORD_HASH_ARGON2_TIME_COST", "1")
+    monkeypatch.setattr(hasher, "_hashers", {})
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_hash_verify_round_trip(monkeypatch, algorithm):
+    if algorithm == "argon2id":
+        pytest.importorskip("argon2")
+    monkeypatch.setenv("PASSWORD_HASH_ALGORITHM", algorithm)
+    encoded = hash_password("secret")
+    assert identify(encoded) == algorithm
+    assert verify_password(encoded, "secret") == (True, False)
+    assert verify_password(encoded, "wrong") == (False, False)
+
+def test_legacy_hash_verifies_and_needs_rehash():
+    encoded = legacy_digest("secret", "salt")
+    assert identify(encoded) == "sha256"
+    assert verify_password(encoded, "secret", "salt") == (True, True)
+    assert verify_password(encoded, "wrong", "salt") == (False, False)
+    assert verify_password(encoded, "secret", "other") == (False, False)
+
+def test_other_algorithm_needs_rehash():
+    encoded = hash_password("secret", "pbkdf2-sha256")
+    assert verify_password(encoded, "secret") == (True, True)
+
+def test_older_parameters_need_rehash(monkeypatch):
+    encoded = hash_password("secret")
+    monkeypatch.setenv("PASSWORD_HASH_SCRYPT_LN", "5")
+    monkeypatch.setattr(hasher, "_hashers", {})
+    assert verify_password(encoded, "secret") == (True, True)
+    assert verify_password(hash_password("secret"), "secret") == (True, False)
+
+def test_full_queue_is_rejected_with_503():
+    async def scenario():
+        pool = PasswordHashPool(workers=1, max_queue=1)
+        release = threading.Event()
+        running = asyncio.create_task(pool._run("scrypt", release.wait))
+        waiting = asyncio.create_task(pool._run("scrypt", release.wait))
+        while pool.running < 1 or pool.waiting < 1:
+            await asyncio.sleep(0.001)
+        with pytest.raises(ErrorServiceUnavailable) as error:
+            await pool._run("scrypt", release.wait)
+        release.set()
+        await asyncio.gather(running, waiting)
+        pool.shutdown()
+        return error.value
+
+    assert asyncio.run(scenario()).code == 503
+
+def test_dummy_hash_is_made_once_with_the_default_algorithm():
+    async def scenario():
+        pool = PasswordHashPool(workers=1, max_queue=1)
+        first, second = await pool.dummy_hash(), await pool.dummy_hash()
+        pool.shutdown()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert identify(first) == "scrypt"
+
+def test_legacy_verify_costs_a_full_hash_too():
+    async def scenario():
+        pool = PasswordHashPool(workers=1, max_queue=1)
+        await pool.dummy_hash()
+        ran = []
+        run = pool._run
+
+        async def recording_run(algorithm, func, *args):
+            ran.append(algorithm)
+            return await run(algorithm, func, *args)
+
+        pool._run = recording_run
+        result = await pool.verify(legacy_digest("secret", "salt"), "secret", "salt")
+        pool.shutdown()
+        return result, ran
+
+    result, ran = asyncio.run(scenario())
+    assert result == (True, True)
+    assert ran == ["scrypt"]
@@ -0,0 +1,291 @@
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Same bounds as pool_monitor.LatencyHistogram, so its histograms export as-is
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+class Counter:
+    """Monotonic counter; `inc` is a dict update, no locking (one event loop per worker)"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0):
+        values = self.values
+        values[labels] = values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        return list(self.values.items())
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: LabelValues = (), amount: float = 1.0):
+        values = self.values
+        values[labels] = values.get(labels, 0.0) - amount
+
+    def set(self, labels: LabelValues, value: float):
+        self.values[labels] = value
+
+class Histogram:
+    """Fixed-bucket histogram; one list per label set: bucket counts, then sum"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)  # + +Inf bucket + sum
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> List[Tuple[LabelValues, List[float]]]:
+        return [(labels, list(series)) for labels, series in self.series.items()]
+
+# Collectors return (name, type, documentation, labelnames, buckets, samples)
+# and are called at snapshot time, so state other modules already keep
+# (statement stats, pool histograms) costs nothing on the hot path.
+Collector = Callable[[], Iterable[Tuple[str, str, str, Sequence[str], Optional[Sequence[float]], List[Tuple[LabelValues, Any]]]]]
+
+class MetricsRegistry:
+    """Metrics of one worker, plus the snapshot/merge/render used to serve /metrics
+
+    Each worker periodically writes its snapshot into one hash per host,
+    METRICS:<host>, under its pid. /metrics renders the snapshot of every
+    live worker as its own series, labelled worker="<pid>", so each series
+    stays monotonic when workers are recycled (SERVER_MAX_REQUESTS) or
+    crash; aggregate in the query, e.g. sum without (worker) (rate(...)).
+    Entries not refreshed for three flush intervals are dropped.
+    """
+
+    # The hash outlives its workers by a day, then a host that is gone cleans up
+    KEY_TTL = 86400
+
+    def __init__(self, prefix: str = "METRICS:"):
+        self.metrics: Dict[str, Any] = {}
+        self.collectors: List[Collector] = []
+        self.key = f"{prefix}{socket.gethostname()}"
+        self.worker = str(os.getpid())
+        self.flush_interval = 5.0
+        self._task: Optional[asyncio.Task] = None
+        self._client = None
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector):
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """JSON-serializable state of this worker"""
+        data = {}
+        for metric in self.metrics.values():
+            data[metric.name] = {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labels": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [[list(labels), value] for labels, value in metric.samples()],
+            }
+        for collector in self.collectors:
+            try:
+                for name, kind, documentation, labelnames, buckets, samples in collector():
+                    data[name] = {
+                        "type": kind,
+                        "help": documentation,
+                        "labels": list(labelnames),
+                        "buckets": list(buckets or ()),
+                        "samples": [[list(labels), value] for labels, value in samples],
+                    }
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+        return data
+
+    @staticmethod
+    def with_label(snapshot: Dict[str, Dict[str, Any]], name: str, value: str) -> Dict[str, Dict[str, Any]]:
+        """The snapshot with one more label on every sample"""
+        return {
+            metric_name: dict(
+                metric,
+                labels=metric["labels"] + [name],
+                samples=[[list(labels) + [value], sample] for labels, sample in metric["samples"]],
+            )
+            for metric_name, metric in snapshot.items()
+        }
+
+    @staticmethod
+    def live_workers(entries: Dict[str, str], now: float, stale_after: float) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Split the host hash into live worker snapshots and stale worker ids"""
+        live = {}
+        stale = []
+        for worker, raw in entries.items():
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                stale.append(worker)
+                continue
+            if now - entry.get("ts", 0) > stale_after:
+                stale.append(worker)
+            else:
+                live[worker] = entry["metrics"]
+        return live, stale
+
+    @staticmethod
+    def merge(snapshots: Iterable[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Sum the snapshots of several workers"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for snapshot in snapshots:
+            for name, metric in snapshot.items():
+                target = merged.get(name)
+                if target is None:
+                    target = merged[name] = dict(metric, samples={})
+                samples = target["samples"]
+                for labels, value in metric["samples"]:
+                    key = tuple(labels)
+                    current = samples.get(key)
+                    if current is None:
+                        samples[key] = list(value) if isinstance(value, list) else value
+                    elif isinstance(value, list):
+                        samples[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        samples[key] = current + value
+        return merged
+
+    @staticmethod
+    def render(merged: Dict[str, Dict[str, Any]]) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for name in sorted(merged):
+            metric = merged[name]
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric["labels"]
+            for labels, value in metric["samples"].items():
+                pairs = [f'{label}="{_escape(value_)}"' for label, value_ in zip(labelnames, labels)]
+                if metric["type"] == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(list(metric["buckets"]) + [math.inf], value[:-1]):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else repr(float(bound))
+                        bucket_labels = ",".join(pairs + ['le="%s"' % le])
+                        lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+                    suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+                    lines.append(f"{name}_sum{suffix} {value[-1]}")
+                    lines.append(f"{name}_count{suffix} {cumulative}")
+                else:
+                    suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+                    lines.append(f"{name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def publish(self, client=None):
+        """Store this worker's snapshot for the other workers of this host"""
+        client = client or self._client
+        if client is None:
+            return
+        entry = json.dumps({"ts": time.time(), "metrics": self.snapshot()})
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hset(self.key, self.worker, entry)
+            pipe.expire(self.key, self.KEY_TTL)
+            await pipe.execute()
+
+    async def collect(self) -> str:
+        """Metrics of every worker on this host, in Prometheus text format"""
+        snapshots = {self.worker: self.snapshot()}
+        if self._client is not None:
+            try:
+                # One hash per host: no scan over the shared keyspace
+                entries = await self._client.hgetall(self.key)
+                entries.pop(self.worker, None)
+                live, stale = self.live_workers(entries, time.time(), self.flush_interval * 3)
+                snapshots.update(live)
+                if stale:
+                    await self._client.hdel(self.key, *stale)
+            except Exception as e:
+                # Serve what this worker has rather than nothing
+                logger.warning(f"Could not read other workers' metrics: {str(e)}")
+        labelled = [self.with_label(snapshot, "worker", worker) for worker, snapshot in snapshots.items()]
+        return self.render(self.merge(labelled))
+
+    def start(self, client, flush_interval: float = 5.0):
+        self._client = client
+        self.flush_interval = flush_interval
+        self._task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        while True:
+            try:
+                await self.publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not publish metrics: {str(e)}")
+            await asyncio.sleep(self.flush_interval)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            try:
+                await self._client.hdel(self.key, self.worker)
+            except Exception:
+                pass
+            self._client = None
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# Global metrics registry of this worker
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"))
+http_requests_in_progress = metrics.gauge(
+    "http_requests_in_progress", "HTTP requests being processed", ("method",))
+redis_command_duration = metrics.histogram(
+    "redis_command_duration_seconds", "Redis command latency (pipelines as PIPELINE)", ("command",))
+redis_command_errors = metrics.counter(
+    "redis_command_errors_total", "Failed Redis commands", ("command",))
+password_hash_duration = metrics.histogram(
+    "password_hash_duration_seconds", "Password hashing time in the API process", ("algorithm",),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0))
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import time
+
+from api.utils.metrics.metrics import MetricsRegistry
+
+def registry():
+    metrics = MetricsRegistry(prefix="TEST_METRICS:")
+    requests = metrics.counter("requests_total", "Requests", ("route",))
+    latency = metrics.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    return metrics, requests, latency
+
+def test_histogram_buckets_render_cumulative_with_sum_and_count():
+    metrics, _, latency = registry()
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value, ("/a",))
+    text = metrics.render(metrics.merge([metrics.snapshot()]))
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{route="/a"} 6.05' in text
+    assert 'latency_seconds_count{route="/a"} 4' in text
+    assert "# TYPE latency_seconds histogram" in text
+
+def test_merge_sums_counters_and_histogram_buckets():
+    metrics, requests, latency = registry()
+    requests.inc(("/a",), 2)
+    latency.observe(0.5, ("/a",))
+    snapshot = metrics.snapshot()
+    merged = metrics.merge([snapshot, snapshot])
+    assert merged["requests_total"]["samples"][("/a",)] == 4
+    assert merged["latency_seconds"]["samples"][("/a",)] == [0, 2, 0, 1.0]
+
+def test_label_values_are_escaped():
+    metrics, requests, _ = registry()
+    requests.inc(('say "hi"\n',))
+    text = metrics.render(metrics.merge([metrics.snapshot()]))
+    assert 'requests_total{route="say \\"hi\\"\\n"} 1.0' in text
+
+def test_workers_are_separate_series():
+    metrics, requests, _ = registry()
+    requests.inc(("/a",))
+    snapshot = metrics.snapshot()
+    merged = metrics.merge([metrics.with_label(snapshot, "worker", "1"), metrics.with_label(snapshot, "worker", "2")])
+    text = metrics.render(merged)
+    assert 'requests_total{route="/a",worker="1"} 1.0' in text
+    assert 'requests_total{route="/a",worker="2"} 1.0' in text
+
+def test_stale_workers_are_dropped():
+    now = time.time()
+    entries = {
+        "1": json.dumps({"ts": now - 1, "metrics": {}}),
+        "2": json.dumps({"ts": now - 60, "metrics": {}}),
+        "3": "not json",
+    }
+    live, stale = MetricsRegistry.live_workers(entries, now, stale_after=15)
+    assert list(live) == ["1"]
+    assert sorted(stale) == ["2", "3"]
+
+class HashOnlyRedis:
+    """Just the hash commands collect() uses"""
+
+    def __init__(self, entries):
+        self.entries = dict(entries)
+
+    async def hgetall(self, key):
+        return dict(self.entries)
+
+    async def hdel(self, key, *fields):
+        for field in fields:
+            self.entries.pop(field, None)
+
+def test_collect_keeps_counters_of_other_live_workers_and_prunes_dead_ones():
+    metrics, requests, _ = registry()
+    requests.inc(("/a",), 3)
+    other = {"requests_total": {"type": "counter", "help": "Requests", "labels": ["route"], "buckets": [],
+                                "samples": [[["/a"], 5.0]]}}
+    client = HashOnlyRedis({
+        "other": json.dumps({"ts": time.time(), "metrics": other}),
+        "gone": json.dumps({"ts": time.time() - 3600, "metrics": other}),
+    })
+    metrics._client = client
+    text = asyncio.run(metrics.collect())
+    assert f'requests_total{{route="/a",worker="{metrics.worker}"}} 3.0' in text
+    assert 'requests_total{route="/a",worker="other"} 5.0' in text
+    assert 'worker="gone"' not in text
+    assert "gone" not in client.entries
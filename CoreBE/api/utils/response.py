@@ -1,3 +1,5 @@
+import base64
+import json
 from typing import Any, Dict, List, Optional, TypeVar, Generic
 from fastapi import status
 from pydantic import BaseModel, Field
@@ -91,6 +93,56 @@ def create_paginated_response(
         }
     )
 
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor"""
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor")
+    return values
+
+def create_cursor_paginated_response(
+    *,
+    items: List[Any],
+    next_cursor: Optional[str],
+    limit: int,
+    total: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Create a cursor (keyset) paginated response
+    
+    Args:
+        items: List of items
+        next_cursor: Cursor of the next page, None on the last page
+        limit: Number of items per page
+        total: Total number of items, only when explicitly requested
+        
+    Returns:
+        Dict containing the paginated response
+    """
+    pagination_info = {
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "has_next": next_cursor is not None
+    }
+    if total is not None:
+        pagination_info["total"] = total
+    
+    return create_response(
+        data={
+            "items": items,
+            "pagination": pagination_info
+        }
+    )
+
 def get_pagination_params(page: int = 1, limit: int = 10) -> Dict[str, int]:
     """
     Get pagination parameters with validation
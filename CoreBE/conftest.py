@@ -0,0 +1 @@
+"""Makes `api` importable when pytest runs from CoreBE/"""